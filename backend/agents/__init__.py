@@ -2,19 +2,38 @@
 from .query import process_query
 from .llm import SmartContractGenerator
 
-# from .merger import select_optimal_code
-from .compiler import check_code, get_solidity_version, set_solc_version
+from .merger import select_optimal_code, select_optimal_index
+from .compiler import check_code, check_codes, get_solidity_version, set_solc_version
+from .compile_service import CompilerBusyError, get_compile_service
+from .solc_versions import resolve_solc_binary
 
 # from .deployer import deploy_code, test_deployed_contract
 from .deployer_v1 import deploy_contract, test_deployed_contract
+from .pipeline import PipelineCancelled, run_pipeline
+from .jobs import JobQueue, JobQueueFullError
+from .chain_manager import GanachePool
+from .deploy_backends import get_deploy_backend
+from .metrics import render_metrics
 
 __all__ = [
     "process_query",
     "SmartContractGenerator",
     "get_solidity_version",
     "set_solc_version",
-    "test_deployed_contract"
-    # "select_optimal_code",
+    "resolve_solc_binary",
+    "test_deployed_contract",
+    "select_optimal_code",
+    "select_optimal_index",
     "check_code",
+    "check_codes",
+    "CompilerBusyError",
+    "get_compile_service",
     "deploy_contract",
+    "run_pipeline",
+    "PipelineCancelled",
+    "JobQueue",
+    "JobQueueFullError",
+    "GanachePool",
+    "get_deploy_backend",
+    "render_metrics",
 ]
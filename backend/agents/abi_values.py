@@ -0,0 +1,102 @@
+import re
+from typing import Any, Dict, List
+
+# Value strategies, in the order deploys try them
+STRATEGIES = ("typical", "zero", "boundary")
+
+ZERO_ADDRESS = "0x" + "00" * 20
+
+_ARRAY_TYPE = re.compile(r"^(.*)\[(\d*)\]$")
+_INT_TYPE = re.compile(r"^(u?)int(\d*)$")
+_BYTES_N_TYPE = re.compile(r"^bytes(\d+)$")
+
+
+class UnsupportedABITypeError(Exception):
+    pass
+
+
+def synthesize_value(param: Dict, strategy: str = "typical", account: str = None) -> Any:
+    """
+    Synthesizes a value for an ABI parameter.
+
+    :param param: The ABI parameter entry, with "type" and, for tuples, "components".
+    :param strategy: "typical" for small plausible values, "zero" for zero/empty values,
+        or "boundary" for maximum values and longer strings/arrays.
+    :param account: An address known to exist on the chain, used for address parameters.
+    :return: A value web3 can encode for the parameter.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown value strategy '{strategy}'.")
+    param_type = param["type"]
+    internal_type = param.get("internalType") or ""
+
+    array_match = _ARRAY_TYPE.match(param_type)
+    if array_match:
+        element = dict(param, type=array_match.group(1))
+        element["internalType"] = _ARRAY_TYPE.sub(r"\1", internal_type)
+        if array_match.group(2):
+            length = int(array_match.group(2))
+        else:
+            length = {"zero": 0, "typical": 2, "boundary": 3}[strategy]
+        return [synthesize_value(element, strategy, account) for _ in range(length)]
+
+    if param_type == "tuple":
+        return tuple(
+            synthesize_value(component, strategy, account)
+            for component in param.get("components", [])
+        )
+
+    int_match = _INT_TYPE.match(param_type)
+    if int_match:
+        if internal_type.startswith("enum "):
+            # Values past the last member make the constructor revert
+            return 0
+        bits = int(int_match.group(2) or 256)
+        if strategy == "zero":
+            return 0
+        if strategy == "boundary":
+            return 2**bits - 1 if int_match.group(1) else 2 ** (bits - 1) - 1
+        return 5
+
+    if param_type == "bool":
+        return strategy != "zero"
+
+    if param_type == "address":
+        if strategy == "zero" or account is None:
+            return ZERO_ADDRESS
+        return account
+
+    if param_type == "string":
+        return {"zero": "", "typical": "Test", "boundary": "A" * 256}[strategy]
+
+    if param_type == "bytes":
+        return {"zero": b"", "typical": b"\x01\x02\x03\x04", "boundary": b"\xff" * 256}[
+            strategy
+        ]
+
+    bytes_match = _BYTES_N_TYPE.match(param_type)
+    if bytes_match:
+        size = int(bytes_match.group(1))
+        return {
+            "zero": bytes(size),
+            "typical": bytes(range(1, size + 1)),
+            "boundary": b"\xff" * size,
+        }[strategy]
+
+    raise UnsupportedABITypeError(
+        f"Contract's constructor required the type {param_type}, which is unsupported by our application's deployment testing."
+    )
+
+
+def synthesize_arguments(
+    inputs: List[Dict], strategy: str = "typical", account: str = None
+) -> List:
+    """
+    Synthesizes arguments for a function or constructor.
+
+    :param inputs: The "inputs" of the function's ABI entry.
+    :param strategy: The value strategy, see synthesize_value.
+    :param account: An address known to exist on the chain.
+    :return: The arguments.
+    """
+    return [synthesize_value(param, strategy, account) for param in inputs]
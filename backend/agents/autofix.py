@@ -0,0 +1,270 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .compiler import check_codes, normalize_source
+
+# (start, end, replacement) in bytes of the normalized source
+Edit = Tuple[int, int, bytes]
+
+RULES: Dict[str, Callable[[bytes, Dict, Dict], Optional[List[Edit]]]] = {}
+
+_IDENTIFIER = re.compile(rb"[A-Za-z_$][A-Za-z0-9_$]*")
+
+
+def rule(error_code: str, description: str):
+    """Registers a fix for a solc error code."""
+
+    def register(fix):
+        fix.description = description
+        RULES[error_code] = fix
+        return fix
+
+    return register
+
+
+def _matching(source: bytes, open_index: int, opening: bytes, closing: bytes) -> int:
+    """Returns the index of the bracket closing the one at open_index, or -1."""
+    depth = 0
+    for index in range(open_index, len(source)):
+        char = source[index : index + 1]
+        if char == opening:
+            depth += 1
+        elif char == closing:
+            depth -= 1
+            if depth == 0:
+                return index
+    return -1
+
+
+def _parameters_end(source: bytes, start: int, end: int) -> int:
+    """Returns the index just past a function header's parameter list, or -1."""
+    open_index = source.find(b"(", start, end)
+    if open_index == -1:
+        return -1
+    close_index = _matching(source, open_index, b"(", b")")
+    return close_index + 1 if close_index != -1 else -1
+
+
+def _location(diagnostic: Dict) -> Tuple[Optional[int], Optional[int]]:
+    return diagnostic.get("start"), diagnostic.get("end")
+
+
+def _overlaps(edit: Edit, other: Edit) -> bool:
+    start, end, _ = edit
+    other_start, other_end, _ = other
+    if start == end == other_start == other_end:
+        # Two insertions at the same point would land in an arbitrary order
+        return True
+    return start < other_end and other_start < end
+
+
+@rule("1878", "added an SPDX license identifier")
+def _add_spdx(source: bytes, diagnostic: Dict, context: Dict) -> Optional[List[Edit]]:
+    return [(0, 0, b"// SPDX-License-Identifier: UNLICENSED\n")]
+
+
+@rule("4937", "added the missing visibility")
+def _add_visibility(source: bytes, diagnostic: Dict, context: Dict) -> Optional[List[Edit]]:
+    start, end = _location(diagnostic)
+    if start is None:
+        return None
+    match = re.search(r'add "(\w+)"', diagnostic.get("message", ""))
+    visibility = match.group(1) if match else "public"
+    index = _parameters_end(source, start, end)
+    if index == -1:
+        return None
+    return [(index, index, f" {visibility}".encode())]
+
+
+@rule("2462", "removed the constructor visibility")
+def _remove_constructor_visibility(
+    source: bytes, diagnostic: Dict, context: Dict
+) -> Optional[List[Edit]]:
+    start, end = _location(diagnostic)
+    if start is None:
+        return None
+    body = source.find(b"{", start, end)
+    header_end = body if body != -1 else end
+    match = re.search(rb"\s+(public|internal)\b", source[start:header_end])
+    if not match:
+        return None
+    return [(start + match.start(), start + match.end(), b"")]
+
+
+@rule("7359", 'replaced "now" with "block.timestamp"')
+def _replace_now(source: bytes, diagnostic: Dict, context: Dict) -> Optional[List[Edit]]:
+    start, end = _location(diagnostic)
+    if start is None or source[start:end] != b"now":
+        return None
+    return [(start, end, b"block.timestamp")]
+
+
+@rule("2018", "restricted the function's state mutability")
+def _restrict_mutability(source: bytes, diagnostic: Dict, context: Dict) -> Optional[List[Edit]]:
+    start, end = _location(diagnostic)
+    match = re.search(r"restricted to (pure|view)", diagnostic.get("message", ""))
+    if start is None or not match:
+        return None
+    index = _parameters_end(source, start, end)
+    if index == -1:
+        return None
+    header_end = source.find(b"{", index, end)
+    header = source[index : header_end if header_end != -1 else end]
+    existing = re.search(rb"\b(view|pure)\b", header)
+    if existing:
+        # view -> pure
+        return [(index + existing.start(), index + existing.end(), match.group(1).encode())]
+    return [(index, index, f" {match.group(1)}".encode())]
+
+
+@rule("5667", "commented out an unused parameter name")
+def _silence_unused_parameter(
+    source: bytes, diagnostic: Dict, context: Dict
+) -> Optional[List[Edit]]:
+    start, end = _location(diagnostic)
+    if start is None:
+        return None
+    names = list(_IDENTIFIER.finditer(source, start, end))
+    if len(names) < 2:
+        return None
+    name = names[-1]
+    return [(name.start(), name.end(), b"/* " + name.group() + b" */")]
+
+
+def _declaration_scope(source: bytes, start: int) -> Tuple[int, int]:
+    """
+    Returns the byte range in which a declaration at start is visible: the whole
+    function for a parameter, or the rest of the enclosing block for a local.
+    """
+    depth = 0
+    for index in range(start - 1, -1, -1):
+        char = source[index : index + 1]
+        if char == b")":
+            depth += 1
+        elif char == b"(":
+            if depth == 0:
+                # A parameter: the scope ends with the function body
+                close_index = _matching(source, index, b"(", b")")
+                body = source.find(b"{", close_index)
+                semicolon = source.find(b";", close_index)
+                if body == -1 or (semicolon != -1 and semicolon < body):
+                    return index, close_index
+                return index, _matching(source, body, b"{", b"}")
+            depth -= 1
+        elif char in (b"{", b"}", b";") and depth == 0:
+            break
+
+    depth = 0
+    for index in range(start, len(source)):
+        char = source[index : index + 1]
+        if char == b"{":
+            depth += 1
+        elif char == b"}":
+            depth -= 1
+            if depth < 0:
+                return start, index
+    return start, len(source)
+
+
+@rule("2519", "renamed a declaration that shadowed another")
+def _rename_shadowing(source: bytes, diagnostic: Dict, context: Dict) -> Optional[List[Edit]]:
+    start, end = _location(diagnostic)
+    if start is None:
+        return None
+    names = list(_IDENTIFIER.finditer(source, start, end))
+    if len(names) < 2:
+        return None
+    name = names[-1].group()
+    renamed = b"_" + name
+    if re.search(rb"\b" + re.escape(renamed) + rb"\b", source):
+        return None
+    scope_start, scope_end = _declaration_scope(source, start)
+    if scope_end == -1:
+        return None
+    pattern = re.compile(rb"(?<![\w$.])" + re.escape(name) + rb"(?![\w$])")
+    return [
+        (match.start(), match.end(), renamed)
+        for match in pattern.finditer(source, max(scope_start, 0), scope_end)
+    ]
+
+
+def autofix_code(
+    code: str, diagnostics: List[Dict], solc_version: str = None
+) -> Tuple[str, List[str]]:
+    """
+    Applies the known source rewrites for the given solc diagnostics.
+
+    :param code: The Solidity source code.
+    :param diagnostics: The "diagnostics" of code's check result, whose offsets refer
+        to the normalized source.
+    :param solc_version: The compiler version the code was checked with.
+    :return: The fixed code and descriptions of the applied fixes. The code is
+        returned unchanged, normalized, when no rule applies.
+    """
+    source = normalize_source(code).encode("utf-8")
+    context = {"solc_version": solc_version}
+    edits: List[Edit] = []
+    applied: List[str] = []
+    for diagnostic in diagnostics:
+        fix = RULES.get(str(diagnostic.get("code")))
+        if fix is None:
+            continue
+        try:
+            fix_edits = fix(source, diagnostic, context)
+        except Exception:
+            fix_edits = None
+        fix_edits = [edit for edit in set(fix_edits or []) if edit not in edits]
+        # A fix applies in full or not at all, so e.g. a rename is never left half done
+        if not fix_edits or any(
+            _overlaps(edit, other) for edit in fix_edits for other in edits
+        ):
+            continue
+        edits.extend(fix_edits)
+        applied.append(fix.description)
+
+    # Apply back to front so earlier offsets stay valid
+    result = source
+    for start, end, replacement in sorted(
+        edits, key=lambda edit: (edit[0], edit[1]), reverse=True
+    ):
+        result = result[:start] + replacement + result[end:]
+    return result.decode("utf-8"), sorted(set(applied))
+
+
+def autofix_candidates(
+    codes: List[str], results: List[Dict], max_passes: int = 3
+) -> Tuple[List[str], List[Dict], List[List[str]]]:
+    """
+    Fixes failed candidates with the local rules and rechecks them, repeating while
+    fixes keep applying. A fix is kept only if the recheck has fewer errors.
+
+    :param codes: The candidate sources.
+    :param results: Their check results, as returned by check_codes.
+    :param max_passes: The maximum number of fix/recheck rounds.
+    :return: The candidates, their check results and the fixes applied to each.
+    """
+    codes, results = list(codes), list(results)
+    applied: List[List[str]] = [[] for _ in codes]
+    for _ in range(max_passes):
+        fixes = {}
+        for index, (code, result) in enumerate(zip(codes, results)):
+            if result["status"] != "Failure" or not result.get("diagnostics"):
+                continue
+            fixed, descriptions = autofix_code(
+                code, result["diagnostics"], result.get("solc_version")
+            )
+            if descriptions and fixed != normalize_source(code):
+                fixes[index] = (fixed, descriptions)
+        if not fixes:
+            break
+
+        rechecked = check_codes([fixed for fixed, _ in fixes.values()])
+        for (index, (fixed, descriptions)), result in zip(fixes.items(), rechecked):
+            if result["status"] == "Busy":
+                continue
+            if result["status"] == "Success" or len(result["errors"]) < len(
+                results[index]["errors"]
+            ):
+                codes[index], results[index] = fixed, result
+                applied[index].extend(descriptions)
+    return codes, results, applied
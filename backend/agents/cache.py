@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+DEFAULT_CACHE_ROOT = os.environ.get(
+    "SC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sc-generation")
+)
+
+
+def make_cache_key(*parts) -> str:
+    """
+    Builds a content-addressed cache key from the given parts.
+
+    :param parts: JSON-serializable values that together identify a cache entry.
+    :return: A hex SHA-256 digest of the canonical JSON encoding of the parts.
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskLRUCache:
+    """
+    A two-level cache: a bounded in-memory LRU in front of a size-bounded
+    directory of JSON files. Entries are evicted least-recently-used first
+    from both levels. Safe to share between threads; the disk level may be
+    shared between processes since writes are atomic renames.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_entries: int = 512,
+        max_disk_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                self._disk_bytes = sum(
+                    size for _, _, size in self._disk_entries()
+                )
+            except OSError:
+                # An unusable cache directory degrades to memory-only caching
+                self.directory = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_mtime, stat.st_size
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        value = self._read_disk(key)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: Dict) -> None:
+        with self._lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self.directory:
+                for path, _, _ in list(self._disk_entries()):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key: str, value: Dict) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Dict]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r") as file:
+                value = json.load(file)
+            # Bump the mtime so disk eviction stays least-recently-used
+            os.utime(path, None)
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, value: Dict) -> None:
+        if not self.directory:
+            return
+        path = self._path(key)
+        temp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w") as file:
+                json.dump(value, file)
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+            with self._lock:
+                self._disk_bytes += os.path.getsize(path) - previous_size
+        except (OSError, TypeError, ValueError):
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        with self._lock:
+            entries = sorted(self._disk_entries(), key=lambda entry: entry[1])
+            total = sum(size for _, _, size in entries)
+            # Trim to 90% of the budget so we don't evict on every write
+            target = int(self.max_disk_bytes * 0.9)
+            for path, _, size in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    continue
+            self._disk_bytes = total
@@ -0,0 +1,105 @@
+import os
+import threading
+from typing import Dict, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+
+DEFAULT_RPC_URL = os.environ.get("SC_ETH_RPC_URL", "http://127.0.0.1:8545")
+
+_lock = threading.Lock()
+_connections: Dict[str, Web3] = {}
+_sessions: Dict[str, requests.Session] = {}
+_accounts: Dict[str, List[str]] = {}
+
+
+def get_web3(endpoint: str = None) -> Web3:
+    """
+    Returns the process-wide Web3 client for an endpoint. Its HTTP session keeps a
+    pool of keep-alive connections, so deploys don't pay connection setup each time.
+
+    :param endpoint: The JSON-RPC URL, defaulting to SC_ETH_RPC_URL.
+    :return: A Web3 instance that is safe to share between threads.
+    """
+    endpoint = endpoint or DEFAULT_RPC_URL
+    with _lock:
+        if endpoint not in _connections:
+            pool_size = int(os.environ.get("SC_ETH_RPC_POOL_SIZE", "16"))
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[endpoint] = session
+            _connections[endpoint] = Web3(
+                Web3.HTTPProvider(
+                    endpoint, request_kwargs={"timeout": 30}, session=session
+                )
+            )
+        return _connections[endpoint]
+
+
+def get_session(endpoint: str = None) -> requests.Session:
+    """
+    Returns the pooled HTTP session behind get_web3(endpoint), for raw JSON-RPC
+    requests such as batches.
+    """
+    endpoint = endpoint or DEFAULT_RPC_URL
+    get_web3(endpoint)
+    return _sessions[endpoint]
+
+
+def get_accounts(endpoint: str = None) -> List[str]:
+    """
+    Returns the node's unlocked accounts, fetched once per endpoint.
+
+    :param endpoint: The JSON-RPC URL, defaulting to SC_ETH_RPC_URL.
+    :return: The account addresses.
+    """
+    endpoint = endpoint or DEFAULT_RPC_URL
+    if endpoint not in _accounts:
+        accounts = list(get_web3(endpoint).eth.accounts)
+        with _lock:
+            _accounts.setdefault(endpoint, accounts)
+    return _accounts[endpoint]
+
+
+class NonceManager:
+    """
+    Hands out sequential nonces per account so concurrent deploys from the same
+    account don't collide. The chain is only asked for a starting nonce once, or
+    again after reset() when a transaction failed to go through.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next: Dict[Tuple[str, str], int] = {}
+
+    def next_nonce(self, w3: Web3, account: str, endpoint: str = None) -> int:
+        key = (endpoint or DEFAULT_RPC_URL, account)
+        with self._lock:
+            if key not in self._next:
+                self._next[key] = w3.eth.get_transaction_count(account, "pending")
+            nonce = self._next[key]
+            self._next[key] += 1
+            return nonce
+
+    def reset(self, account: str, endpoint: str = None) -> None:
+        with self._lock:
+            self._next.pop((endpoint or DEFAULT_RPC_URL, account), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._next.clear()
+
+
+nonce_manager = NonceManager()
+
+
+def reset_connections() -> None:
+    """Drops cached clients and accounts, e.g. after the node was restarted."""
+    with _lock:
+        _connections.clear()
+        _sessions.clear()
+        _accounts.clear()
+    nonce_manager.clear()
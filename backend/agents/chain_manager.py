@@ -0,0 +1,62 @@
+import os
+import socket
+import subprocess
+import time
+from typing import List
+
+from web3 import Web3
+
+
+def ganache_ports() -> List[int]:
+    """The ports of the local Ganache pool, from SC_GANACHE_PORTS (default "8545")."""
+    return [
+        int(port)
+        for port in os.environ.get("SC_GANACHE_PORTS", "8545").split(",")
+        if port.strip()
+    ]
+
+
+def ganache_endpoints() -> List[str]:
+    return [f"http://127.0.0.1:{port}" for port in ganache_ports()]
+
+
+def take_snapshot(w3: Web3) -> str:
+    return w3.provider.make_request("evm_snapshot", [])["result"]
+
+
+def revert_snapshot(w3: Web3, snapshot_id: str) -> bool:
+    return bool(w3.provider.make_request("evm_revert", [snapshot_id]).get("result"))
+
+
+class GanachePool:
+    """
+    Runs one ganache-cli process per port so deploys can be leased to isolated chains.
+    """
+
+    def __init__(self, ports: List[int] = None, command: List[str] = None):
+        self.ports = ports or ganache_ports()
+        self.command = command or ["ganache-cli"]
+        self.processes: List[subprocess.Popen] = []
+
+    def start(self, timeout: float = 30) -> None:
+        for port in self.ports:
+            self.processes.append(
+                subprocess.Popen(
+                    self.command + ["-p", str(port)],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            )
+        deadline = time.time() + timeout
+        for port in self.ports:
+            while time.time() < deadline:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                    break
+                except OSError:
+                    time.sleep(0.2)
+
+    def terminate(self) -> None:
+        for process in self.processes:
+            process.terminate()
+        self.processes = []
@@ -0,0 +1,191 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from .metrics import gauge
+
+
+class CompileServiceError(Exception):
+    pass
+
+
+class CompilerBusyError(CompileServiceError):
+    pass
+
+
+class CompileTimeoutError(CompileServiceError):
+    pass
+
+
+def _compile_job(sources: Dict[str, str], solc_binary: str, timeout: float) -> Dict:
+    # Imported lazily so the worker processes resolve it after they start
+    from .compiler import compile_sources
+
+    return compile_sources(sources, solc_binary, timeout=timeout)
+
+
+def _warm_up_job() -> bool:
+    from . import compiler  # noqa: F401
+
+    return True
+
+
+class CompileService:
+    """
+    A fixed-size pool of compiler worker processes with a bounded submission queue.
+    At most max_workers + max_pending jobs are admitted at once; anything beyond
+    that is rejected immediately with CompilerBusyError instead of forking more
+    solc processes onto a saturated machine.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_pending: int = 4,
+        timeout: float = 60,
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._in_flight = 0
+        # Separate from _lock: shutdown() cancels futures, running _release, under _lock
+        self._in_flight_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Forking a threaded server process is unsafe, so start workers cleanly
+                method = (
+                    "forkserver"
+                    if "forkserver" in multiprocessing.get_all_start_methods()
+                    else "spawn"
+                )
+                context = multiprocessing.get_context(method)
+                if method == "forkserver":
+                    # Workers fork with the compiler already imported. They still
+                    # import the main script as __mp_main__, so server start-up must
+                    # not happen at import (see server_main.start_services)
+                    context.set_forkserver_preload([f"{__package__}.compiler"])
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=context
+                )
+            return self._executor
+
+    def in_flight(self) -> int:
+        """Returns the number of admitted jobs, running or queued."""
+        with self._in_flight_lock:
+            return self._in_flight
+
+    def _release(self, _future: Future = None) -> None:
+        with self._in_flight_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def warm_up(self) -> None:
+        """Starts every worker process ahead of the first compile."""
+        executor = self._get_executor()
+        for future in [executor.submit(_warm_up_job) for _ in range(self.max_workers)]:
+            future.result()
+
+    def submit_batch(
+        self, sources: Dict[str, str], solc_binary: str, timeout: float = None
+    ) -> "Future[Dict[str, Dict]]":
+        """
+        Queues a compilation of one or more sources without waiting for it.
+
+        :param sources: A mapping of unique source name to Solidity source code.
+        :param solc_binary: Path of the solc binary to invoke.
+        :param timeout: Seconds solc may run before it is killed.
+        :return: A future resolving to compile_sources' result; cancel() it to drop a queued job.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise CompilerBusyError(
+                "Compiler service is at capacity, try again shortly."
+            )
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            future = self._get_executor().submit(
+                _compile_job, sources, solc_binary, timeout or self.timeout
+            )
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def wait(self, future: Future, timeout: float = None):
+        """
+        Waits for a submitted job, cancelling it if it does not finish in time.
+
+        :param future: A future returned by submit_batch().
+        :param timeout: Seconds to wait for the job, including time spent queued.
+        :return: The job's result.
+        """
+        timeout = timeout or self.timeout
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise CompileTimeoutError(f"Compilation timed out after {timeout} seconds.")
+        except BrokenProcessPool:
+            # A crashed worker poisons the pool, so start a fresh one next time
+            self.shutdown()
+            raise CompileServiceError("Compiler worker exited unexpectedly.")
+        except CancelledError:
+            # Another caller's shutdown() dropped the queued job
+            raise CompileServiceError("Compilation was cancelled by a pool restart.")
+
+    def compile(self, code: str, solc_binary: str, timeout: float = None) -> Dict:
+        """
+        Compiles a single source on the worker pool and waits for the result.
+
+        :param code: The Solidity source code.
+        :param solc_binary: Path of the solc binary to invoke.
+        :param timeout: Seconds to wait for the job, including time spent queued.
+        :return: compile_source's result dictionary.
+        """
+        future = self.submit_batch({"Contract.sol": code}, solc_binary, timeout)
+        return self.wait(future, timeout)["Contract.sol"]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_service: Optional[CompileService] = None
+_service_lock = threading.Lock()
+
+gauge(
+    "sc_compile_jobs_in_flight",
+    "Compile jobs admitted to the worker pool, running or queued.",
+    lambda: {(): _service.in_flight()} if _service is not None else {},
+)
+
+
+def get_compile_service() -> CompileService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            workers = int(
+                os.environ.get(
+                    "SC_COMPILE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))
+                )
+            )
+            _service = CompileService(
+                max_workers=workers,
+                max_pending=int(os.environ.get("SC_COMPILE_QUEUE", str(2 * workers))),
+                timeout=float(os.environ.get("SC_COMPILE_TIMEOUT", "60")),
+            )
+            atexit.register(_service.shutdown)
+        return _service
@@ -1,150 +1,319 @@
 import subprocess
-import tempfile
 import os
 import json
+import logging
 import re
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, List, Union
 
+from .cache import DEFAULT_CACHE_ROOT, DiskLRUCache, make_cache_key
+from .compile_service import CompileServiceError, CompilerBusyError, get_compile_service
+from .metrics import cache_requests, stage_failures, timer
+from .precheck import precheck_code
+from .solc_versions import SolcNotFoundError, resolve_solc
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_SELECTION = [
+    "abi",
+    "metadata",
+    "evm.bytecode",
+    "evm.bytecode.sourceMap",
+]
+
+# Compilation is a pure function of (source, compiler version, output selection),
+# so repeated sources from the retry loop or benchmark reruns skip solc entirely.
+compile_cache = DiskLRUCache(
+    directory=os.environ.get(
+        "SC_COMPILE_CACHE_DIR", os.path.join(DEFAULT_CACHE_ROOT, "compile")
+    ),
+    max_entries=int(os.environ.get("SC_COMPILE_CACHE_ENTRIES", "512")),
+    max_disk_bytes=int(os.environ.get("SC_COMPILE_CACHE_BYTES", str(64 * 1024 * 1024))),
+)
+
+
+# Slither impact levels, lowest first
+SEVERITIES = ["Optimization", "Informational", "Low", "Medium", "High"]
+
+analysis_cache = DiskLRUCache(
+    directory=os.environ.get(
+        "SC_ANALYSIS_CACHE_DIR", os.path.join(DEFAULT_CACHE_ROOT, "slither")
+    ),
+    max_entries=256,
+    max_disk_bytes=16 * 1024 * 1024,
+)
+# Each analysis is its own slither process, so threads are enough to overlap them
+_analysis_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("SC_SLITHER_WORKERS", "2")),
+    thread_name_prefix="slither",
+)
+
 
 def get_solidity_version(code: str) -> str:
     match = re.search(r"pragma solidity\s+([^;]+);", code)
     return match.group(1).strip() if match else None
 
 
+def normalize_source(code: str) -> str:
+    """
+    Normalizes line endings and trailing whitespace so that trivially different
+    generations of the same contract share a cache entry. Line numbers are
+    preserved so diagnostics still point at the right place in the original.
+
+    :param code: The Solidity source code.
+    :return: The normalized source code, which is also what gets compiled.
+    """
+    lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).rstrip("\n") + "\n"
+
+
+def get_compile_cache_stats() -> Dict[str, int]:
+    return compile_cache.stats()
+
+
 def set_solc_version(version: str) -> bool:
-    try:
-        version = version.replace("^", "")
-        subprocess.run(
-            ["solc-select", "install", version],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        subprocess.run(
-            ["solc-select", "use", version],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+    """
+    Ensures a locally installed solc satisfies the given pragma range. Nothing
+    global is switched: callers compile with resolve_solc_binary(version) directly.
 
-        # print("Solidity version installed and set successfully.")
+    :param version: The pragma version range, e.g. "^0.8.0".
+    :return: True on success, otherwise the error message.
+    """
+    try:
+        resolve_solc(version)
         return True
-    except subprocess.CalledProcessError as e:
-        error_message = e.stderr.decode("utf-8").strip()
-        return error_message
+    except (SolcNotFoundError, ValueError) as e:
+        return str(e)
 
 
-def run_static_analyses(contract_path: str, temp_dir: str) -> List[str]:
-    errors = []
-    slither_output_path = os.path.join(temp_dir, "slither_output.json")
-    try:
+def _slither_findings(code: str, solc_binary: str) -> List[Dict]:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        contract_path = os.path.join(temp_dir, "Contract.sol")
+        with open(contract_path, "w") as file:
+            file.write(code)
+        slither_output_path = os.path.join(temp_dir, "slither_output.json")
+        # Pointing Slither at the solc we already resolved skips its own version lookup
         result = subprocess.run(
-            ["slither", contract_path, "--json", slither_output_path],
+            ["slither", contract_path, "--solc", solc_binary, "--json", slither_output_path],
             capture_output=True,
             text=True,
             check=False,
+            cwd=temp_dir,
         )
 
-        if result.returncode != 0:
-            return [f"Slither failed to execute: {result.stderr}"]
-
+        # Slither exits non-zero when detectors fire, so the report is what counts
+        if not os.path.exists(slither_output_path):
+            raise RuntimeError(f"Slither failed to execute: {result.stderr}")
         with open(slither_output_path, "r") as file:
             slither_output = json.load(file)
 
-        for detector in slither_output.get("detectors", []):
-            issue_description = f"{detector.get('check', 'Unknown Check')}: {detector.get('description', 'No description provided.')}"
-            errors.append(issue_description)
+    if not slither_output.get("success", True):
+        raise RuntimeError(f"Slither failed to execute: {slither_output.get('error')}")
+    return [
+        {
+            "check": detector.get("check", "Unknown Check"),
+            "impact": detector.get("impact", "Informational"),
+            "confidence": detector.get("confidence"),
+            "description": detector.get(
+                "description", "No description provided."
+            ).strip(),
+        }
+        for detector in (slither_output.get("results") or {}).get("detectors", [])
+    ]
+
 
+def run_static_analyses(code: str, min_severity: str = None) -> Dict:
+    """
+    Runs the Slither detectors on a contract, compiling with the same solc that
+    check_code resolves for it. Findings are cached by source and compiler version.
+
+    :param code: The Solidity source code.
+    :param min_severity: The lowest impact reported: "Optimization", "Informational",
+        "Low", "Medium" or "High". Defaults to SC_SLITHER_MIN_SEVERITY ("Medium").
+    :return: A dictionary containing the status ("Failure" if any finding is reported),
+        the formatted errors and the structured findings.
+    """
+    min_severity = min_severity or os.environ.get("SC_SLITHER_MIN_SEVERITY", "Medium")
+    if min_severity not in SEVERITIES:
+        logger.warning("Unknown Slither severity %r, using Medium.", min_severity)
+        min_severity = "Medium"
+    try:
+        solc_version, solc_binary = resolve_solc(get_solidity_version(code) or "")
+        code = normalize_source(code)
+        cache_key = make_cache_key("slither", code, solc_version)
+        cached = analysis_cache.get(cache_key)
+        cache_requests.inc(cache="slither", result="miss" if cached is None else "hit")
+        if cached is None:
+            with timer("slither"):
+                cached = {"findings": _slither_findings(code, solc_binary)}
+            analysis_cache.set(cache_key, cached)
     except Exception as e:
-        errors.append(f"Error running static analysis: {str(e)}")
+        return {
+            "status": "Error",
+            "errors": [f"Error running static analysis: {str(e)}"],
+            "findings": [],
+        }
 
-    return errors
+    threshold = SEVERITIES.index(min_severity)
+    findings = [
+        finding
+        for finding in cached["findings"]
+        if finding["impact"] in SEVERITIES
+        and SEVERITIES.index(finding["impact"]) >= threshold
+    ]
+    return {
+        "status": "Failure" if findings else "Success",
+        "errors": [
+            f"{finding['check']} ({finding['impact']}): {finding['description']}"
+            for finding in findings
+        ],
+        "findings": findings,
+    }
 
 
-def check_code(
-    code: str, analysis_depth: str = "standard"
-) -> Dict[str, Union[str, List[str], Dict]]:
-    errors: List[str] = []
-    abi: Dict = {}
+def submit_static_analyses(code: str, min_severity: str = None) -> "Future[Dict]":
+    """
+    Runs run_static_analyses on a background thread, e.g. while the contract deploys.
 
-    solidity_version = get_solidity_version(code)
-    if solidity_version is None:
-        return {
-            "status": "Failure",
-            "errors": ["No Solidity version specified in the pragma statement."],
+    :return: A future resolving to run_static_analyses' result.
+    """
+    return _analysis_executor.submit(run_static_analyses, code, min_severity)
+
+
+def _source_outputs(compile_output: Dict, name: str) -> Dict:
+    errors = []
+    for error in compile_output.get("errors", []):
+        location = error.get("sourceLocation")
+        if location and location.get("file") != name:
+            continue
+        error = dict(error)
+        # Report every candidate as Contract.sol so cached entries are position-independent
+        if name != "Contract.sol":
+            error["formattedMessage"] = error.get("formattedMessage", "").replace(
+                name, "Contract.sol"
+            )
+            if location:
+                error["sourceLocation"] = dict(location, file="Contract.sol")
+        errors.append(error)
+
+    contracts = {}
+    for contract_name, contract_data in (
+        compile_output.get("contracts", {}).get(name, {}).items()
+    ):
+        bytecode = contract_data.get("evm", {}).get("bytecode", {})
+        contracts[contract_name] = {
+            "abi": contract_data.get("abi", []),
+            "bytecode": bytecode.get("object", ""),
+            "sourceMap": bytecode.get("sourceMap", ""),
+            "metadata": contract_data.get("metadata", ""),
         }
 
-    version_set = set_solc_version(solidity_version)
-    if version_set is not True:
-        return {
-            "status": "Failure",
+    return {"errors": errors, "contracts": contracts, "cacheable": True}
+
+
+def compile_sources(
+    sources: Dict[str, str], solc_binary: str = "solc", timeout: float = None
+) -> Dict[str, Dict]:
+    """
+    Compiles several independent sources in a single solc standard JSON invocation.
+
+    :param sources: A mapping of unique source name to Solidity source code.
+    :param solc_binary: Path of the solc binary to invoke.
+    :param timeout: Seconds solc may run before it is killed.
+    :return: A mapping of source name to a dictionary with the raw solc "errors" list,
+        per-contract "contracts" artifacts (ABI, bytecode, source map and metadata) and
+        a "cacheable" flag that is False when the compiler itself failed to run.
+    """
+    compile_input = {
+        "language": "Solidity",
+        "sources": {name: {"content": code} for name, code in sources.items()},
+        "settings": {"outputSelection": {"*": {"*": OUTPUT_SELECTION}}},
+    }
+
+    try:
+        compile_result = subprocess.run(
+            [solc_binary, "--standard-json"],
+            input=json.dumps(compile_input),
+            capture_output=True,
+            text=True,
+            check=False,
+            timeout=timeout,
+        )
+        compile_output = json.loads(compile_result.stdout)
+    except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+        failure = {
             "errors": [
-                f"Failed to set Solidity version to {solidity_version}. Ensure it is installed and try again.",
-                version_set,
+                {
+                    "severity": "error",
+                    "formattedMessage": f"Compilation process failed: {e}",
+                }
             ],
+            "contracts": {},
+            "cacheable": False,
         }
+        return {name: failure for name in sources}
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        contract_path = os.path.join(temp_dir, "Contract.sol")
-        with open(contract_path, "w") as file:
-            file.write(code)
+    outputs = {name: _source_outputs(compile_output, name) for name in sources}
 
-        compile_cmd = ["solc", "--standard-json", "--allow-paths", temp_dir]
-        compile_input = {
-            "language": "Solidity",
-            "sources": {"Contract.sol": {"content": code}},
-            "settings": {
-                "outputSelection": {
-                    "*": {
-                        "*": [
-                            "abi",
-                            "metadata",
-                            "evm.bytecode",
-                            "evm.bytecode.sourceMap",
-                        ]
-                    }
-                }
-            },
-        }
+    # solc skips code generation for the whole batch if any source has an error,
+    # so sources that were fine on their own are compiled again without the broken ones
+    failed = [
+        name
+        for name, output in outputs.items()
+        if any(error.get("severity") == "error" for error in output["errors"])
+    ]
+    if failed and len(failed) < len(sources):
+        retry = {name: code for name, code in sources.items() if name not in failed}
+        outputs.update(compile_sources(retry, solc_binary, timeout))
 
-        try:
-            compile_result = subprocess.run(
-                compile_cmd,
-                input=json.dumps(compile_input),
-                capture_output=True,
-                text=True,
-                check=False,
+    return outputs
+
+
+def compile_source(code: str, solc_binary: str = "solc", timeout: float = None) -> Dict:
+    """
+    Compiles the source via the solc standard JSON interface.
+
+    :param code: The Solidity source code.
+    :param solc_binary: Path of the solc binary to invoke.
+    :param timeout: Seconds solc may run before it is killed.
+    :return: The compile_sources() entry for the source.
+    """
+    return compile_sources({"Contract.sol": code}, solc_binary, timeout)["Contract.sol"]
+
+
+def _build_check_result(
+    compile_output: Dict, solc_version: str
+) -> Dict[str, Union[str, List[str], Dict]]:
+    errors: List[str] = []
+    diagnostics: List[Dict] = []
+    abi: Dict = {}
+
+    for error in compile_output.get("errors", []):
+        if error.get("severity") in ["error", "warning"]:
+            errors.append(error.get("formattedMessage", "Unknown compilation issue."))
+            location = error.get("sourceLocation") or {}
+            diagnostics.append(
+                {
+                    "severity": error.get("severity"),
+                    "type": error.get("type"),
+                    "code": error.get("errorCode"),
+                    "message": error.get("message", ""),
+                    "start": location.get("start"),
+                    "end": location.get("end"),
+                }
             )
-            compile_output = json.loads(compile_result.stdout)
-
-            if "errors" in compile_output:
-                for error in compile_output["errors"]:
-                    if error.get("severity") in ["error", "warning"]:
-                        errors.append(
-                            error.get("formattedMessage", "Unknown compilation issue.")
-                        )
-
-            if compile_output.get("contracts"):
-                # Iterate over all contracts in the file
-                for contract_name, contract_data in compile_output["contracts"][
-                    "Contract.sol"
-                ].items():
-                    if "abi" in contract_data:
-                        abi[contract_name] = contract_data["abi"]
-
-            # if not errors or all("warning" in e for e in errors):
-            #    analysis_errors = run_static_analyses(contract_path, temp_dir)
-            #    errors.extend(analysis_errors)
-
-        except subprocess.CalledProcessError as e:
-            errors.append(f"Compilation process failed: {e.stderr}")
+
+    for contract_name, contract_data in compile_output.get("contracts", {}).items():
+        if "abi" in contract_data:
+            abi[contract_name] = contract_data["abi"]
 
     if errors:
         status = "Failure"
         print(
             f"\033[38;5;208m************** Compilation process failed with the following errors ************** \033[0m"
         )
-        print(f"\033[38;5;208m****** {errors} ****** \033[0m")
+        logger.debug("Compilation errors: %s", errors)
     else:
         status = "Success"
         print(
@@ -154,9 +323,128 @@ def check_code(
     result = {
         "status": status,
         "errors": errors,
+        # The same issues in structured form, with byte offsets into the normalized source
+        "diagnostics": diagnostics,
+        "solc_version": solc_version,
     }
 
     if abi:
         result["abi"] = abi
 
+    if compile_output.get("contracts"):
+        # Compiled artifacts travel with the check results so the deployer never recompiles
+        result["artifacts"] = {
+            contract_name: {
+                "abi": contract_data["abi"],
+                "bytecode": contract_data["bytecode"],
+                "sourceMap": contract_data["sourceMap"],
+            }
+            for contract_name, contract_data in compile_output["contracts"].items()
+        }
+
     return result
+
+
+def check_codes(codes: List[str]) -> List[Dict[str, Union[str, List[str], Dict]]]:
+    """
+    Checks several candidate contracts at once. Cached sources are answered directly
+    and the remaining ones are compiled in one solc invocation per compiler version.
+
+    :param codes: The candidate Solidity sources.
+    :return: One check_code()-shaped result per candidate, in the same order.
+    """
+    with timer("compile"):
+        results = _check_codes(codes)
+    for result in results:
+        if result["status"] != "Success":
+            stage_failures.inc(stage="compile", failure=result["status"].lower())
+    return results
+
+
+def _check_codes(codes: List[str]) -> List[Dict]:
+    results: List[Dict] = [None] * len(codes)
+    pending: Dict[str, Dict] = {}
+
+    for index, code in enumerate(codes):
+        # Structurally broken output is rejected without launching solc
+        precheck_errors = precheck_code(normalize_source(code))
+        if precheck_errors:
+            results[index] = {
+                "status": "Failure",
+                "errors": [error.pop("formattedMessage") for error in precheck_errors],
+                "diagnostics": precheck_errors,
+            }
+            continue
+
+        solidity_version = get_solidity_version(code)
+        if solidity_version is None:
+            results[index] = {
+                "status": "Failure",
+                "errors": ["No Solidity version specified in the pragma statement."],
+            }
+            continue
+
+        try:
+            with timer("solc_version"):
+                solc_version, solc_binary = resolve_solc(solidity_version)
+        except (SolcNotFoundError, ValueError) as e:
+            results[index] = {
+                "status": "Failure",
+                "errors": [
+                    f"Failed to set Solidity version to {solidity_version}. Ensure it is installed and try again.",
+                    str(e),
+                ],
+            }
+            continue
+
+        code = normalize_source(code)
+        cache_key = make_cache_key(code, solc_version, OUTPUT_SELECTION)
+        compile_output = compile_cache.get(cache_key)
+        cache_requests.inc(cache="compile", result="miss" if compile_output is None else "hit")
+        if compile_output is not None:
+            results[index] = _build_check_result(compile_output, solc_version)
+            continue
+
+        batch = pending.setdefault(
+            solc_binary, {"version": solc_version, "sources": {}, "keys": {}}
+        )
+        name = "Contract.sol" if len(codes) == 1 else f"candidate{index}/Contract.sol"
+        batch["sources"][name] = code
+        batch["keys"][name] = (index, cache_key)
+
+    # Submit every version group before waiting so they compile in parallel
+    futures = []
+    for solc_binary, batch in pending.items():
+        try:
+            futures.append(
+                (batch, get_compile_service().submit_batch(batch["sources"], solc_binary))
+            )
+        except CompileServiceError as e:
+            futures.append((batch, e))
+
+    for batch, future in futures:
+        try:
+            if isinstance(future, CompileServiceError):
+                raise future
+            outputs = get_compile_service().wait(future)
+        except CompileServiceError as e:
+            for index, _ in batch["keys"].values():
+                results[index] = {
+                    "status": "Busy" if isinstance(e, CompilerBusyError) else "Failure",
+                    "errors": [str(e)],
+                }
+            continue
+
+        for name, compile_output in outputs.items():
+            index, cache_key = batch["keys"][name]
+            if compile_output.get("cacheable"):
+                compile_cache.set(cache_key, compile_output)
+            results[index] = _build_check_result(compile_output, batch["version"])
+
+    return results
+
+
+def check_code(
+    code: str, analysis_depth: str = "standard"
+) -> Dict[str, Union[str, List[str], Dict]]:
+    return check_codes([code])[0]
@@ -0,0 +1,209 @@
+import itertools
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from web3 import Web3
+
+from .chain import DEFAULT_RPC_URL, get_accounts, get_web3, nonce_manager
+from .chain_manager import ganache_endpoints, revert_snapshot, take_snapshot
+
+
+class ChainLease:
+    """A chain handed out by a DeployBackend for the duration of one deploy."""
+
+    def __init__(self, w3: Web3, account: str, endpoint: str = None):
+        self.w3 = w3
+        self.account = account
+        # Only chains shared over RPC need nonces managed on our side
+        self.endpoint = endpoint
+
+    def transaction(self) -> Dict:
+        """Returns the base transaction fields for the next transaction from the account."""
+        params = {"from": self.account}
+        if self.endpoint:
+            params["nonce"] = nonce_manager.next_nonce(
+                self.w3, self.account, self.endpoint
+            )
+        return params
+
+    def transaction_failed(self) -> None:
+        """Forgets the reserved nonce after a transaction that was never sent."""
+        if self.endpoint:
+            nonce_manager.reset(self.account, self.endpoint)
+
+
+class DeployBackend:
+    """
+    Where contracts get deployed. Implementations hand out a ChainLease per deploy.
+    """
+
+    name = "base"
+
+    @contextmanager
+    def lease(self, revert: bool = True, read_only: bool = False) -> Iterator[ChainLease]:
+        """
+        :param revert: Whether the chain is rewound after the lease. Validation deploys
+            are reverted; a final deploy must not be, or its contract disappears.
+        :param read_only: The lease only makes calls and gas estimates, never sends a
+            transaction, so nothing needs rewinding and revert is ignored.
+        """
+        raise NotImplementedError
+
+
+class RPCDeployBackend(DeployBackend):
+    """
+    Deploys to external JSON-RPC nodes such as ganache-cli.
+
+    With snapshots enabled, each lease gets exclusive use of one node from the pool,
+    which is snapshotted (evm_snapshot) before the deploy and reverted (evm_revert)
+    afterwards. The chain then never grows, and parallel deploys go to different nodes.
+    Non-reverting leases also get a node exclusively, so no other lease's revert can
+    undo their deploy. Without snapshots every lease shares the first endpoint.
+    Read-only leases share the nodes round-robin, without a snapshot.
+    """
+
+    name = "rpc"
+
+    def __init__(self, endpoints: List[str] = None, snapshots: bool = True):
+        self.endpoints = endpoints or [DEFAULT_RPC_URL]
+        self.snapshots = snapshots
+        self._idle: "queue.Queue[str]" = queue.Queue()
+        for endpoint in self.endpoints:
+            self._idle.put(endpoint)
+        self._round_robin = itertools.cycle(self.endpoints)
+        self._round_robin_lock = threading.Lock()
+
+    @contextmanager
+    def lease(self, revert: bool = True, read_only: bool = False) -> Iterator[ChainLease]:
+        if read_only or not self.snapshots:
+            if not self.snapshots:
+                endpoint = self.endpoints[0]
+            else:
+                with self._round_robin_lock:
+                    endpoint = next(self._round_robin)
+            yield ChainLease(get_web3(endpoint), get_accounts(endpoint)[0], endpoint)
+            return
+
+        endpoint = self._idle.get()
+        try:
+            w3 = get_web3(endpoint)
+            account = get_accounts(endpoint)[0]
+            if not revert:
+                yield ChainLease(w3, account, endpoint)
+                return
+            snapshot_id = take_snapshot(w3)
+            try:
+                yield ChainLease(w3, account, endpoint)
+            finally:
+                revert_snapshot(w3, snapshot_id)
+                # Reverting rewinds the account's nonce as well
+                nonce_manager.reset(account, endpoint)
+        finally:
+            self._idle.put(endpoint)
+
+
+class EthTesterDeployBackend(DeployBackend):
+    """
+    Deploys to in-process py-evm chains through eth-tester: no network hop and no
+    receipt polling, since every transaction is mined as soon as it is sent.
+
+    Each lease gets a chain of its own from a pool. Chains are reverted to their
+    snapshot when returned, so parallel deploys are isolated and memory stays flat.
+    After a non-reverting lease the chain is snapshotted again, keeping its deploys.
+    Read-only leases still get a chain of their own, as py-evm chains are not
+    thread-safe, but skip the revert.
+    """
+
+    name = "eth-tester"
+
+    def __init__(self, max_chains: int = 4):
+        # Fail when the backend is configured rather than on every deploy
+        try:
+            from eth_tester import EthereumTester, PyEVMBackend
+        except ImportError:
+            raise ImportError(
+                "The eth-tester deploy backend requires: pip install 'eth-tester[py-evm]'"
+            )
+        self._tester_classes = (EthereumTester, PyEVMBackend)
+        self.max_chains = max_chains
+        self._idle: "queue.Queue" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create_chain(self):
+        EthereumTester, PyEVMBackend = self._tester_classes
+        tester = EthereumTester(PyEVMBackend())
+        w3 = Web3(Web3.EthereumTesterProvider(tester))
+        return tester, w3, w3.eth.accounts[0], tester.take_snapshot()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.max_chains
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self._create_chain()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    @contextmanager
+    def lease(self, revert: bool = True, read_only: bool = False) -> Iterator[ChainLease]:
+        chain = self._acquire()
+        tester, w3, account, snapshot = chain
+        try:
+            yield ChainLease(w3, account)
+        finally:
+            # A read-only lease left the chain as it was
+            if revert and not read_only:
+                tester.revert_to_snapshot(snapshot)
+            elif not read_only:
+                chain = (tester, w3, account, tester.take_snapshot())
+            self._idle.put(chain)
+
+
+_backend: Optional[DeployBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_deploy_backend() -> DeployBackend:
+    """
+    Returns the configured deploy backend: SC_DEPLOY_BACKEND is "rpc" (the default)
+    or "eth-tester". The rpc backend uses SC_ETH_RPC_URL, or the local Ganache pool
+    on SC_GANACHE_PORTS when that is set; SC_CHAIN_SNAPSHOTS=0 turns off
+    snapshot/revert around deploys.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = os.environ.get("SC_DEPLOY_BACKEND", "rpc")
+            if name == "rpc":
+                _backend = RPCDeployBackend(
+                    endpoints=ganache_endpoints()
+                    if os.environ.get("SC_GANACHE_PORTS")
+                    else [DEFAULT_RPC_URL],
+                    snapshots=os.environ.get("SC_CHAIN_SNAPSHOTS", "1") == "1",
+                )
+            elif name == "eth-tester":
+                _backend = EthTesterDeployBackend(
+                    max_chains=int(os.environ.get("SC_DEPLOY_CHAINS", "4"))
+                )
+            else:
+                raise ValueError(f"Unknown deploy backend '{name}'.")
+        return _backend
+
+
+def set_deploy_backend(backend: DeployBackend) -> None:
+    global _backend
+    with _backend_lock:
+        _backend = backend
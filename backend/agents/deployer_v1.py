@@ -1,47 +1,221 @@
 from typing import Dict, List, Union
 import json
+import logging
+import re
+import time
 from web3 import Web3, HTTPProvider
-from solcx import compile_standard, install_solc
+from web3.exceptions import ContractLogicError
 
-from .compiler import get_solidity_version, set_solc_version
+from .chain import DEFAULT_RPC_URL
+from .abi_values import STRATEGIES, UnsupportedABITypeError, synthesize_arguments
+from .compiler import check_code
+from .deploy_backends import ChainLease, get_deploy_backend
+from .metrics import stage_duration, stage_failures
+from .precheck import _tokenize
+from .security import get_mythril_runner
 
 # deployer.py
-import os
 import requests
-import subprocess
-import tempfile
 
+logger = logging.getLogger(__name__)
 
-def deploy_contract(code: str) -> Dict[str, str]:
-    errors: List[str] = []
+_CONTRACT_DECLARATION = re.compile(r"\bcontract\s+([A-Za-z_$][\w$]*)")
 
-    version = get_solidity_version(code)
-    version = version.replace("^", "")
-
-    install_solc(version)
-    set_solc_version(version)
-
-    # Compile the Solidity contract
-    compiled_sol = compile_standard(
-        {
-            "language": "Solidity",
-            "sources": {"Contract.sol": {"content": code}},
-            "settings": {
-                "outputSelection": {
-                    "*": {"*": ["abi", "metadata", "evm.bytecode", "evm.sourceMap"]}
-                }
-            },
-        },
-        solc_version=version,
-    )
 
-    # Get the contract interface
-    contract_id, contract_interface = compiled_sol["contracts"][
-        "Contract.sol"
-    ].popitem()
+def select_deploy_target(artifacts: Dict[str, Dict], code: str = None) -> Dict:
+    """
+    Picks the contract to deploy: the last one declared in the source, which is usually
+    the main one. Interfaces and abstract contracts have no bytecode and are skipped.
+
+    :param artifacts: The "artifacts" entry of check_code's result, keyed by contract
+        name in solc's (alphabetical) order.
+    :param code: The Solidity source code. Without it, the last deployable artifact is
+        picked.
+    :return: The contract's artifact.
+    """
+    deployable = [name for name, artifact in artifacts.items() if artifact.get("bytecode")]
+    if not deployable:
+        # Deploying it reports the missing bytecode
+        return artifacts[list(artifacts)[-1]]
+    if code:
+        # Comments and strings are blanked, so only real declarations count
+        declared = [
+            name
+            for name in _CONTRACT_DECLARATION.findall(_tokenize(code)[2])
+            if name in deployable
+        ]
+        if declared:
+            return artifacts[declared[-1]]
+    return artifacts[deployable[-1]]
+
+
+def build_constructor_args(
+    constructor_abi: Union[Dict, None],
+    account: str,
+    errors: List[str],
+    strategy: str = "typical",
+) -> List:
+    """
+    Synthesizes constructor arguments from the constructor ABI.
+
+    :param constructor_abi: The constructor's ABI entry, or None if there is no constructor.
+    :param account: An address known to exist on the chain.
+    :param errors: A list that unsupported parameter types are reported to.
+    :param strategy: The value strategy: "typical", "zero" or "boundary".
+    :return: The constructor arguments.
+    """
+    if not constructor_abi:
+        return []
+    try:
+        return synthesize_arguments(constructor_abi["inputs"], strategy, account)
+    except UnsupportedABITypeError as e:
+        errors.append(str(e))
+        return []
+
+
+def estimate_deploy_gas(
+    artifacts: Dict[str, Dict], chain: ChainLease = None, code: str = None
+) -> Union[int, None]:
+    """
+    Estimates the gas needed to deploy the compiled contract without sending a transaction.
+
+    :param artifacts: The "artifacts" entry of check_code's result.
+    :param chain: The chain to estimate on; one is leased from the deploy backend if omitted.
+    :param code: The Solidity source code, to pick the contract to deploy (see
+        select_deploy_target).
+    :return: The estimated gas, or None if it could not be estimated.
+    """
+    if not artifacts:
+        return None
+    if chain is None:
+        try:
+            with get_deploy_backend().lease(read_only=True) as chain:
+                return estimate_deploy_gas(artifacts, chain, code)
+        except Exception:
+            return None
+
+    contract_interface = select_deploy_target(artifacts, code)
+    try:
+        w3 = chain.w3
+        account = chain.account
+        contract = w3.eth.contract(
+            abi=contract_interface["abi"], bytecode=contract_interface["bytecode"]
+        )
+        constructor_abi = next(
+            (abi for abi in contract_interface["abi"] if abi["type"] == "constructor"),
+            None,
+        )
+        errors: List[str] = []
+        constructor_args = build_constructor_args(constructor_abi, account, errors)
+        if errors:
+            return None
+        return contract.constructor(*constructor_args).estimate_gas({"from": account})
+    except Exception:
+        return None
+
+
+def revert_reason(error: Exception) -> str:
+    """Extracts the revert reason from a failed call or gas estimation."""
+    if isinstance(error, ContractLogicError):
+        return str(getattr(error, "message", None) or error).replace("execution reverted: ", "", 1)
+    return str(error)
+
+
+def simulate_deploy(contract, constructor_args: List, account: str) -> Dict:
+    """
+    Simulates the creation transaction with eth_estimateGas instead of mining it. The
+    estimate fails the same way the constructor would, with its revert reason.
+
+    :param contract: The web3 contract factory.
+    :param constructor_args: The constructor arguments.
+    :param account: The sender.
+    :return: A dictionary containing the status, errors, gas used and revert reason.
+    """
+    transaction = {
+        "from": account,
+        "data": contract.constructor(*constructor_args).data_in_transaction,
+    }
+    try:
+        gas_used = contract.w3.eth.estimate_gas(transaction)
+    except ContractLogicError as e:
+        reason = revert_reason(e)
+        return {
+            "status": "Failure",
+            "errors": [f"Constructor reverted: {reason}"],
+            "revert_reason": reason,
+        }
+    return {"status": "Success", "errors": [], "gas_used": gas_used}
+
+
+def deploy_contract(
+    code: str,
+    artifacts: Dict[str, Dict] = None,
+    chain: ChainLease = None,
+    dry_run: bool = False,
+    gas_estimate: int = None,
+) -> Dict[str, str]:
+    """
+    Deploys the contract to the local chain.
+
+    :param code: The Solidity source code.
+    :param artifacts: The "artifacts" entry of check_code's result for this code. When
+        omitted the code is checked first, which is served from the compile cache if it
+        was already compiled.
+    :param chain: The chain to deploy to; one is leased from the configured deploy
+        backend (SC_DEPLOY_BACKEND) for the duration of the deploy if omitted. Only
+        dry runs are reverted afterwards, so a real deploy stays on chain.
+    :param dry_run: Only simulate the creation transaction (eth_estimateGas), so nothing
+        is mined and no receipt is awaited. The result then has "gas_used" or
+        "revert_reason" instead of "contract_address".
+    :param gas_estimate: The estimate_deploy_gas() result for these artifacts, if already
+        known. It came from the same simulation with the typical constructor
+        arguments, so a dry run reports it instead of simulating again.
+    :return: A dictionary containing the deployment status, errors and contract address.
+    """
+    if dry_run and gas_estimate is not None and artifacts:
+        result = {"status": "Success", "errors": [], "dry_run": True, "gas_used": gas_estimate}
+        constructor_abi = next(
+            (
+                abi
+                for abi in select_deploy_target(artifacts, code)["abi"]
+                if abi["type"] == "constructor"
+            ),
+            None,
+        )
+        if constructor_abi and constructor_abi["inputs"]:
+            result["constructor_strategy"] = STRATEGIES[0]
+        return result
+
+    if chain is None:
+        try:
+            # Dry runs only estimate gas, so they share the chain without a snapshot
+            with get_deploy_backend().lease(revert=False, read_only=dry_run) as chain:
+                return deploy_contract(code, artifacts, chain, dry_run)
+        except requests.exceptions.ConnectionError:
+            return {
+                "status": "Failure",
+                "errors": [
+                    f"Connection error. Make sure Ganache is running at {DEFAULT_RPC_URL}. You can start Ganache using this command in terminal: ganache-cli"
+                ],
+            }
+
+    errors: List[str] = []
+    tx_receipt = None
+    simulation = None
+    start = time.perf_counter()
+
+    if artifacts is None:
+        artifacts = check_code(code).get("artifacts")
+    if not artifacts:
+        return {
+            "status": "Failure",
+            "errors": ["No compiled contract is available to deploy."],
+        }
+
+    contract_interface = select_deploy_target(artifacts, code)
 
     # Get the bytecode and ABI
-    bytecode = contract_interface["evm"]["bytecode"]["object"]
+    bytecode = contract_interface["bytecode"]
     abi = contract_interface["abi"]
 
     print(
@@ -49,14 +223,14 @@ def deploy_contract(code: str) -> Dict[str, str]:
     )
 
     try:
-        # Connect to Ganache
-        w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+        # The leased chain: Ganache over a pooled connection, or an in-process EVM
+        w3 = chain.w3
 
         # Create a contract instance
         contract = w3.eth.contract(abi=abi, bytecode=bytecode)
 
-        # Get the account to deploy from -> Ganache generates testing accounts and we use the first one of those
-        account = w3.eth.accounts[0]
+        # Get the account to deploy from -> the chain generates testing accounts and we use the first one of those
+        account = chain.account
 
         # Check if the contract has a constructor
         constructor_abi = next(
@@ -64,51 +238,51 @@ def deploy_contract(code: str) -> Dict[str, str]:
             None,
         )
 
-        if constructor_abi:
-            # If the contract has a constructor, get the constructor parameters from the user
-            constructor_args = []
-            for input_param in constructor_abi["inputs"]:
-                param_type = input_param["type"]
-                param_name = input_param["name"]
-                # param_value = input(f"Enter the value for {param_name} ({param_type}): ")
-                # could replace the hardcoded values below with prompts for param_values from the user, but as we are just
-                if param_type.startswith("uint") or param_type.startswith("int"):
-                    param_value = int(5)
-                elif param_type == "bool":
-                    param_value = bool(True)  # an arbitrary bool
-                elif param_type == "address":
-                    param_value = account  # a sample address that we know exist
-                else:
-                    param_value = None
-                    errors.append(
-                        f"Contract's constructor required the type {param_type}, which is unsupported by our application's deployment testing."
-                    )
-                # Note that more conversions may be needed to automatically test
-                constructor_args.append(param_value)
-
-            # Deploy the contract with constructor arguments
-            tx_hash = contract.constructor(*constructor_args).transact(
-                {"from": account}
-            )
-        else:
-            # If the contract doesn't have a constructor, deploy without arguments
-            tx_hash = contract.constructor().transact({"from": account})
-
-        # Wait for the transaction to be mined and get the transaction receipt
-        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        constructor_args = build_constructor_args(constructor_abi, account, errors)
+        has_inputs = bool(constructor_abi and constructor_abi["inputs"])
+
+        if not errors and (dry_run or has_inputs):
+            # Validate the constructor without mining anything, retrying with
+            # alternative argument values before reporting a revert
+            for strategy in STRATEGIES if has_inputs else STRATEGIES[:1]:
+                constructor_args = build_constructor_args(
+                    constructor_abi, account, errors, strategy
+                )
+                attempt = simulate_deploy(contract, constructor_args, account)
+                if simulation is None or attempt["status"] == "Success":
+                    simulation = attempt
+                if attempt["status"] == "Success":
+                    break
+            if has_inputs and simulation["status"] == "Success":
+                simulation["constructor_strategy"] = strategy
+            errors.extend(simulation.pop("errors"))
+
+        if not dry_run and not errors:
+            # Deploy the contract with constructor arguments (none if there's no constructor)
+            try:
+                tx_hash = contract.constructor(*constructor_args).transact(
+                    chain.transaction()
+                )
+            except Exception:
+                # The nonce was not consumed, so resynchronize with the chain next time
+                chain.transaction_failed()
+                raise
+
+            # Wait for the transaction to be mined and get the transaction receipt
+            tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+
+            # Get the contract address
+            contract_address = tx_receipt.contractAddress
 
-        # Get the contract address
-        contract_address = tx_receipt.contractAddress
-
-        print(
-            f"\033[38;5;196m************** Contract deployed at address: {contract_address} **************\033[0m"
-        )
+            print(
+                f"\033[38;5;196m************** Contract deployed at address: {contract_address} **************\033[0m"
+            )
 
-        # Return the deployed contract instance
-        deployed_contract = w3.eth.contract(address=contract_address, abi=abi)
+            # Return the deployed contract instance
+            deployed_contract = w3.eth.contract(address=contract_address, abi=abi)
     except requests.exceptions.ConnectionError as e:
         errors.append(
-            "Connection error. Make sure Ganache is running on port 8545. You can start Ganache using this command in terminal: ganache-cli"
+            f"Connection error. Make sure Ganache is running at {DEFAULT_RPC_URL}. You can start Ganache using this command in terminal: ganache-cli"
         )
     except Exception as e:
         # print(type(e))
@@ -118,74 +292,61 @@ def deploy_contract(code: str) -> Dict[str, str]:
         print(
             f"\033[38;5;196m************** Deployer Found Errors. Errors Sent to LLM **************\033[0m"
         )
-        print(errors)
+        logger.debug("Deployment errors: %s", errors)
+    mode = "dry_run" if dry_run else "transact"
+    stage_duration.observe(time.perf_counter() - start, stage="deploy", mode=mode)
+    if errors:
+        failure = "revert" if simulation and simulation.get("revert_reason") else "error"
+        stage_failures.inc(stage="deploy", failure=failure, mode=mode)
 
     result = {
         "status": "Failure" if errors else "Success",
         "errors": errors,
     }
 
-    if tx_receipt.contractAddress:
+    if tx_receipt and tx_receipt.contractAddress:
         result["contract_address"] = contract_address
+    if simulation and "constructor_strategy" in simulation:
+        result["constructor_strategy"] = simulation["constructor_strategy"]
+    if dry_run:
+        result["dry_run"] = True
+        result.update(simulation or {})
 
     return result
 
 
 def test_deployed_contract(
-    contract_address: str, code: str
-) -> Union[Dict[str, str], None]:
+    contract_address: str, code: str, artifacts: Dict[str, Dict] = None
+) -> Union[Dict, None]:
     """
-    Tests the deployed contract at the given address and returns the test results.
+    Runs the Mythril security analysis on the deployed contract's compiled bytecode.
 
     :param contract_address: The address of the deployed contract.
-    :return: A dictionary containing the test results or None if the contract address is invalid.
+    :param code: The Solidity source code.
+    :param artifacts: The "artifacts" entry of check_code's result for this code. When
+        omitted the code is checked first, which is served from the compile cache if it
+        was already compiled.
+    :return: The analysis report with "status", "errors" and structured "issues", or
+        None if the contract address is invalid.
     """
+    if not Web3.is_address(contract_address):
+        print(f"Invalid contract address: {contract_address}")
+        return None
+
+    if artifacts is None:
+        artifacts = check_code(code).get("artifacts")
+    if not artifacts:
+        return {
+            "status": "Error",
+            "errors": ["No compiled contract is available to analyze."],
+            "issues": [],
+        }
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        contract_path = os.path.join(temp_dir, "Contract.sol")
-        with open(contract_path, "w") as file:
-            file.write(code)
-
-        try:
-            errors = []
-            mythril_output_path = os.path.join(temp_dir, "mythril_output.json")
-
-            w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
-            if not w3.is_address(contract_address):
-                print(f"Invalid contract address: {contract_address}")
-                return None
-
-            command = f"myth analyze {contract_path}"
-            result = subprocess.run(
-                command, shell=True, check=True, capture_output=True, text=True
-            )
-            print("completed testing subprocess")
-            print(result)
-
-            if result.returncode != 0:
-                return [f"Mythril failed to execute: {result.stderr}"]
-
-            mythril_output = result.stdout
-            return mythril_output
-            # with open(mythril_output_path, 'r') as file:
-            #     mythril_output = json.load(file)
-            #
-            # for detector in mythril_output.get('detectors', []):
-            #     issue_description = f"{detector.get('check', 'Unknown Check')}: {detector.get('description', 'No description provided.')}"
-            #     errors.append(issue_description)
-            # return errors
-
-        except requests.exceptions.ConnectionError as e:
-            print(
-                "Connection error. Make sure Ganache is running on port 8545. You can start Ganache using this command in terminal: ganache-cli"
-            )
-            return None
-        except subprocess.CalledProcessError as e:
-            print(f"Test deployed contract process failed:: {e.stderr}")
-            return None
-        except Exception as e:
-            print(type(e))
-            return None
+    report = get_mythril_runner().analyze(
+        select_deploy_target(artifacts, code)["bytecode"]
+    )
+    print("completed testing subprocess")
+    return report
 
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+import os
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from .compiler import normalize_source
+
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("SC_FEEDBACK_TOKEN_BUDGET", "1000"))
+
+# Lower numbers are kept first when the budget runs out
+PRIORITY_COMPILE_ERROR = 0
+PRIORITY_DEPLOY = 1
+PRIORITY_TEST = 2
+PRIORITY_COMPILE_WARNING = 3
+PRIORITY_TEST_WARNING = 4
+PRIORITY_ANALYSIS = 5
+
+_MAX_ITEM_CHARS = 400
+_MAX_EXCERPT_CHARS = 160
+
+
+def estimate_tokens(text: str) -> int:
+    """A rough token count (about four characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def _truncate(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+def _line_of(source: bytes, offset: int) -> Tuple[int, str]:
+    """Returns the 1-based line number and the text of the line at a byte offset."""
+    line_start = source.rfind(b"\n", 0, offset) + 1
+    line_end = source.find(b"\n", offset)
+    line = source[line_start : line_end if line_end != -1 else len(source)]
+    return source.count(b"\n", 0, offset) + 1, line.decode("utf-8", "replace").strip()
+
+
+def _group_diagnostics(diagnostics: List[Dict], code: str) -> List[Tuple[int, str]]:
+    """
+    Dedupes diagnostics and groups them by error code and message, so an issue that
+    solc reports on many lines becomes one item listing those lines.
+    """
+    source = normalize_source(code).encode("utf-8") if code else b""
+    groups: "OrderedDict[Tuple, Dict]" = OrderedDict()
+    for diagnostic in diagnostics:
+        key = (diagnostic.get("severity"), diagnostic.get("code"), diagnostic.get("message"))
+        group = groups.setdefault(key, {"lines": OrderedDict(), **diagnostic})
+        start = diagnostic.get("start")
+        if source and start is not None and 0 <= start <= len(source):
+            line_number, excerpt = _line_of(source, start)
+            group["lines"].setdefault(line_number, excerpt)
+
+    items = []
+    for (severity, code_id, message), group in groups.items():
+        label = group.get("type") or severity or "Issue"
+        if code_id:
+            label += f" {code_id}"
+        lines = list(group["lines"].items())
+        if lines:
+            where = ", ".join(str(number) for number, _ in lines[:5])
+            if len(lines) > 5:
+                where += f" and {len(lines) - 5} more"
+            number, excerpt = lines[0]
+            text = f"{label} at line {where}: {message}\n  {number} | {_truncate(excerpt, _MAX_EXCERPT_CHARS)}"
+        else:
+            text = f"{label}: {message}"
+        priority = PRIORITY_COMPILE_ERROR if severity == "error" else PRIORITY_COMPILE_WARNING
+        items.append((priority, text))
+    return items
+
+
+def _string_items(errors, priority: int, prefix: str) -> List[Tuple[int, str]]:
+    if isinstance(errors, str):
+        errors = [errors]
+    seen, items = set(), []
+    for error in errors or []:
+        text = f"{prefix}{_truncate(error, _MAX_ITEM_CHARS)}"
+        if text not in seen:
+            seen.add(text)
+            items.append((priority, text))
+    return items
+
+
+def collect_feedback_items(feedback: Dict, code: str = None) -> List[Tuple[int, str]]:
+    """
+    Turns the pipeline's feedback dictionary into deduplicated (priority, text) items.
+
+    :param feedback: The "check_results", "deploy_results", "test_results" and
+        "analysis_results" of the previous attempt.
+    :param code: The previous attempt's code, used for source excerpts.
+    :return: The items, most important first.
+    """
+    items: List[Tuple[int, str]] = []
+    check_results = feedback.get("check_results") or {}
+    if check_results.get("diagnostics"):
+        items += _group_diagnostics(check_results["diagnostics"], code)
+    else:
+        items += _string_items(
+            check_results.get("errors"), PRIORITY_COMPILE_ERROR, "Compilation: "
+        )
+    items += _string_items(
+        (feedback.get("deploy_results") or {}).get("errors"), PRIORITY_DEPLOY, "Deployment: "
+    )
+    items += _string_items(
+        (feedback.get("test_results") or {}).get("errors"), PRIORITY_TEST, "Test: "
+    )
+    # Reverting getters, which may be intended (e.g. state checks) but often are not
+    items += _string_items(
+        (feedback.get("test_results") or {}).get("warnings"),
+        PRIORITY_TEST_WARNING,
+        "Test warning: ",
+    )
+    items += _string_items(
+        (feedback.get("analysis_results") or {}).get("errors"),
+        PRIORITY_ANALYSIS,
+        "Static analysis: ",
+    )
+    # sorted() is stable, so items keep their order within a priority
+    return sorted(items, key=lambda item: item[0])
+
+
+def compact_feedback(feedback: Dict, code: str = None, token_budget: int = None) -> str:
+    """
+    Renders feedback as one compact text that fits a token budget. Items are added in
+    priority order (compile errors, deploy errors, test failures, compile warnings,
+    test warnings, static analysis findings); whatever doesn't fit is summarized in a closing line.
+
+    :param feedback: The "check_results", "deploy_results", "test_results" and
+        "analysis_results" of the previous attempt.
+    :param code: The previous attempt's code, used for source excerpts.
+    :param token_budget: The maximum estimated tokens, defaulting to SC_FEEDBACK_TOKEN_BUDGET.
+    :return: The feedback text, or an empty string if there is nothing to report.
+    """
+    token_budget = token_budget or DEFAULT_TOKEN_BUDGET
+    items = collect_feedback_items(feedback or {}, code)
+
+    kept: List[str] = []
+    used = 0
+    for index, (_, text) in enumerate(items):
+        cost = estimate_tokens(text + "\n")
+        if used + cost > token_budget and kept:
+            omitted = len(items) - index
+            kept.append(f"... {omitted} more issue(s) omitted.")
+            break
+        kept.append(text)
+        used += cost
+    return "\n".join(kept)
@@ -0,0 +1,255 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+from .cache import DEFAULT_CACHE_ROOT
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    A persistent SQLite-backed job queue drained by a bounded pool of worker threads.
+
+    Several processes (e.g. gunicorn workers) may share one database: jobs are
+    claimed atomically, so each runs exactly once. Running queues keep a heartbeat on
+    the jobs they claimed; jobs whose heartbeat is older than stale_after seconds were
+    left by a process that died and are put back in the queue. A heartbeat rather than
+    a PID check, since a restarted container process often gets its old PID back.
+
+    A handler raising one of retry_on (e.g. a transient overload) puts its job back
+    in the queue, delayed by retry_delay seconds doubling with every retry, and the
+    job fails once it has been retried max_retries times.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict], Dict],
+        path: str = None,
+        num_workers: int = 2,
+        max_queued: int = 100,
+        poll_interval: float = 0.5,
+        heartbeat_interval: float = 10,
+        stale_after: float = 60,
+        retry_on: Tuple[Type[Exception], ...] = (),
+        retry_delay: float = 5,
+        max_retries: int = 5,
+    ):
+        self.handler = handler
+        self.path = path or os.path.join(DEFAULT_CACHE_ROOT, "jobs.sqlite3")
+        self.num_workers = num_workers
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.retry_on = retry_on
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        # Identifies this queue's claims; unlike the PID it is never reused
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._workers: List[threading.Thread] = []
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, "
+                "result TEXT, error TEXT, worker_pid INTEGER, created_at REAL NOT NULL, "
+                "started_at REAL, finished_at REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)"
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(jobs)")}
+            # Databases created before heartbeats and retries were tracked
+            for column, column_type in (
+                ("owner", "TEXT"),
+                ("heartbeat_at", "REAL"),
+                ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+                ("run_after", "REAL"),
+            ):
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    @contextmanager
+    def _connection(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def submit(self, payload: Dict) -> str:
+        """
+        Enqueues a job.
+
+        :param payload: The JSON-serializable job input passed to the handler.
+        :return: The job id.
+        """
+        job_id = uuid.uuid4().hex
+        with self._connection() as connection:
+            queued = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+            ).fetchone()[0]
+            if queued >= self.max_queued:
+                raise JobQueueFullError("Job queue is full, try again later.")
+            connection.execute(
+                "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, 'queued', ?, ?)",
+                (job_id, json.dumps(payload), time.time()),
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Looks up a job.
+
+        :param job_id: The job id returned by submit().
+        :return: The job's id, status, result, error, retry count and timestamps, or
+            None if unknown.
+        """
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT id, status, result, error, attempts, created_at, started_at, "
+                "finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(
+            zip(
+                [
+                    "id",
+                    "status",
+                    "result",
+                    "error",
+                    "attempts",
+                    "created_at",
+                    "started_at",
+                    "finished_at",
+                ],
+                row,
+            )
+        )
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _claim(self) -> Optional[Dict]:
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = connection.execute(
+                "SELECT id, payload, attempts FROM jobs WHERE status = 'queued' "
+                "AND (run_after IS NULL OR run_after <= ?) ORDER BY created_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, owner = ?, "
+                "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (os.getpid(), self.owner, now, now, row[0]),
+            )
+            connection.execute("COMMIT")
+        return {"id": row[0], "payload": json.loads(row[1]), "attempts": row[2]}
+
+    def _finish(self, job_id: str, result: Dict = None, error: str = None) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ?",
+                (
+                    "failed" if error else "finished",
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+
+    def _retry(self, job: Dict, error: Exception) -> None:
+        if job["attempts"] >= self.max_retries:
+            self._finish(job["id"], error=f"{type(error).__name__}: {error}")
+            return
+        with self._connection() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'queued', worker_pid = NULL, owner = NULL, "
+                "heartbeat_at = NULL, attempts = ?, run_after = ? WHERE id = ?",
+                (
+                    job["attempts"] + 1,
+                    time.time() + self.retry_delay * 2 ** job["attempts"],
+                    job["id"],
+                ),
+            )
+
+    def _requeue_orphans(self) -> None:
+        with self._connection() as connection:
+            requeued = connection.execute(
+                "UPDATE jobs SET status = 'queued', worker_pid = NULL, owner = NULL, "
+                "heartbeat_at = NULL WHERE status = 'running' AND owner IS NOT ? "
+                "AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (self.owner, time.time() - self.stale_after),
+            ).rowcount
+        if requeued:
+            self._wakeup.set()
+
+    def _heartbeat(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                with self._connection() as connection:
+                    connection.execute(
+                        "UPDATE jobs SET heartbeat_at = ? "
+                        "WHERE status = 'running' AND owner = ?",
+                        (time.time(), self.owner),
+                    )
+                self._requeue_orphans()
+            except sqlite3.Error:
+                # A locked database only delays the beat; stale_after allows for that
+                pass
+            self._stopping.wait(self.heartbeat_interval)
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            job = self._claim()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            try:
+                self._finish(job["id"], result=self.handler(job["payload"]))
+            except self.retry_on as e:
+                self._retry(job, e)
+            except Exception as e:
+                self._finish(job["id"], error=f"{type(e).__name__}: {e}")
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._requeue_orphans()
+        for index in range(self.num_workers):
+            worker = threading.Thread(
+                target=self._work, name=f"job-worker-{index}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._workers.append(heartbeat)
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for worker in self._workers:
+            worker.join(timeout=1)
+        self._workers = []
@@ -1,12 +1,25 @@
 from typing import List, Dict, Union
 from typing_extensions import Protocol
+import logging
 import os
-import pprint
 from io import StringIO
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 
 # from langchain.llms.openai import AzureOpenAI, OpenAI
 from langchain_community.chat_models import AzureChatOpenAI, ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
+from langchain.schema import BaseMessage, HumanMessage, SystemMessage
+
+from .feedback import compact_feedback
+from .llm_cache import CachedChatModel, LLMResponseCache
+from .metrics import timer
+from .patching import PATCH_INSTRUCTIONS, PatchError, apply_patch
+from .rate_limiter import get_rate_limiter
+from .streaming import SolidityStreamMonitor
+
+
+logger = logging.getLogger(__name__)
 
 
 class SmartContractGenerator:
@@ -16,11 +29,23 @@ class SmartContractGenerator:
         model_name: str = "gpt-3.5-turbo-0125",
         temperature: float = 0.5,
         request_timout: int = 120,
+        max_concurrency: int = None,
+        requests_per_minute: float = None,
+        llm=None,
+        cache_mode: str = None,
+        cache_path: str = None,
+        streaming: bool = None,
+        max_preamble_tokens: int = 200,
+        feedback_token_budget: int = None,
+        repair_mode: str = None,
     ):
-        if not azure_config and not os.environ["OPENAI_API_KEY"]:
+        if llm is None and not azure_config and not os.environ.get("OPENAI_API_KEY"):
             raise ValueError("Azure Config or OpenAI API key are missing.")
 
-        if azure_config:
+        if llm is not None:
+            # A pre-built chat model, e.g. a stand-in for offline runs
+            self.llm = llm
+        elif azure_config:
             self.llm = AzureChatOpenAI(
                 openai_api_type="azure",
                 openai_api_base=azure_config["openai_api_base"],
@@ -37,6 +62,43 @@ class SmartContractGenerator:
                 temperature=temperature,
                 request_timeout=request_timout,
             )
+
+        # Shared by every generator using this model, across the sync and async paths
+        self.rate_limiter = get_rate_limiter(
+            model_name,
+            max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute,
+        )
+
+        cache_mode = cache_mode or os.environ.get("SC_LLM_CACHE_MODE", "bypass")
+        if cache_mode != "bypass":
+            cache = LLMResponseCache(
+                path=cache_path or os.environ.get("SC_LLM_CACHE_PATH"),
+                ttl=float(os.environ["SC_LLM_CACHE_TTL"])
+                if os.environ.get("SC_LLM_CACHE_TTL")
+                else None,
+                max_entries=int(os.environ.get("SC_LLM_CACHE_ENTRIES", "10000")),
+            )
+            self.llm = CachedChatModel(
+                self.llm,
+                cache,
+                model_name,
+                temperature,
+                mode=cache_mode,
+                rate_limiter=self.rate_limiter,
+            )
+
+        if streaming is None:
+            streaming = os.environ.get("SC_LLM_STREAMING", "0") == "1"
+        self.streaming = streaming
+        self.max_preamble_tokens = max_preamble_tokens
+        # Estimated tokens the feedback of a retry may take, see feedback.compact_feedback
+        self.feedback_token_budget = feedback_token_budget
+        # "full" regenerates the contract on retries, "patch" asks for edits to it
+        self.repair_mode = repair_mode or os.environ.get("SC_REPAIR_MODE", "full")
+        if self.repair_mode not in ("full", "patch"):
+            raise ValueError(f"Unknown repair mode '{self.repair_mode}'.")
+
         print(
             f"\033[94m************** LLM Smart Contract Generator Successfully Initialized ************** \033[0m"
         )
@@ -70,49 +132,107 @@ class SmartContractGenerator:
         code = code.replace("```solidity", "").replace("```", "")
         return code
 
-    def generate_initial_code_version(self, processed_prompt: str) -> str:
+    def invoke(self, messages: List[BaseMessage], sample: int = 0) -> str:
         """
-        Generates the initial version of code based on the given processed query.
+        Sends messages to the LLM within the model's rate limits.
 
         Args:
-            processed_prompt (str): The processed query string intended for code generation.
+            messages (List[BaseMessage]): The chat messages.
+            sample (int): The candidate index within the current batch, which keeps the cached responses of the candidates apart.
 
         Returns:
-            str: The initially generated code as a string.
+            str: The response content.
         """
-        messages = [
-            SystemMessage(content=processed_prompt),
-        ]
-        # Implement logic to modify code generation based on feedback
-        print(
-            f"\033[94m************** Generating Smart Contract With LLM **************"
-        )
-        response = self.llm(messages).content
-        code = self.clean_code(response)
-        pprint.pprint(code)
+        with timer("llm", mode="invoke"):
+            if isinstance(self.llm, CachedChatModel):
+                # The cache applies the rate limit itself, so hits return immediately
+                return self.llm.invoke(messages, sample=sample).content
+            with self.rate_limiter.slot():
+                return self.llm.invoke(messages).content
 
-        # pprint.pprint(processed_prompt)
-        # print()
-        print("\033[0m")
-        return code
+    def stream_invoke(self, messages: List[BaseMessage], sample: int = 0) -> str:
+        """
+        Streams the response, stopping at the closing code fence or as soon as the
+        response is clearly not Solidity, so no time is spent on the remaining tokens.
 
-    def generate_code_version_with_feedback(
+        Args:
+            messages (List[BaseMessage]): The chat messages.
+            sample (int): The candidate index within the current batch, see invoke().
+
+        Returns:
+            str: The code received, or the partial response if generation was aborted.
+        """
+        monitor = SolidityStreamMonitor(max_preamble_tokens=self.max_preamble_tokens)
+        state = monitor.CONTINUE
+        # A cached model only rate-limits the requests that actually reach the provider
+        if isinstance(self.llm, CachedChatModel):
+            limit = nullcontext()
+            stream_kwargs = {"sample": sample}
+        else:
+            limit = self.rate_limiter.slot()
+            stream_kwargs = {}
+        with timer("llm", mode="stream"), limit:
+            stream = self.llm.stream(messages, **stream_kwargs)
+            try:
+                for chunk in stream:
+                    state = monitor.feed(chunk.content)
+                    if state != monitor.CONTINUE:
+                        break
+            finally:
+                # Closing the stream drops the connection, so the provider stops generating
+                if hasattr(stream, "close"):
+                    stream.close()
+
+        if state == monitor.ABORT:
+            print(
+                f"\033[94m************** Generation Aborted: {monitor.reason} **************\033[0m"
+            )
+        return monitor.code
+
+    def complete(self, messages: List[BaseMessage], sample: int = 0) -> str:
+        if self.streaming:
+            return self.stream_invoke(messages, sample=sample)
+        return self.invoke(messages, sample=sample)
+
+    async def ainvoke(self, messages: List[BaseMessage], sample: int = 0) -> str:
+        """
+        Async counterpart of invoke(), using the chat model's async invocation.
+
+        Args:
+            messages (List[BaseMessage]): The chat messages.
+            sample (int): The candidate index within the current batch, see invoke().
+
+        Returns:
+            str: The response content.
+        """
+        with timer("llm", mode="ainvoke"):
+            if isinstance(self.llm, CachedChatModel):
+                response = await self.llm.ainvoke(messages, sample=sample)
+                return response.content
+            async with self.rate_limiter.aslot():
+                response = await self.llm.ainvoke(messages)
+            return response.content
+
+    def build_feedback_messages(
         self,
         processed_prompt: str,
         output_code: str,
         feedback: Dict[str, Union[str, List[str]]] = None,
-    ) -> str:
+        patch: bool = False,
+    ) -> List[BaseMessage]:
         """
-        Enhances the code generation process by utilizing feedback from previous attempts to generate a refined version of code.
+        Builds the message list for a generation that takes feedback into account.
 
         Args:
             processed_prompt (str): The processed query string for which the code is generated.
             output_code (str): The output code from the previous code generation attempt.
-            feedback (Dict[str, Union[str, List[str]]], optional): Feedback provided from previous checks, deployments, or tests, structured as a dictionary. This feedback includes keys such as 'check_results', 'deploy_results', and 'test_results', each possibly containing a sub-dictionary with an 'errors' key that maps to a string or list of strings detailing specific issues.
+            feedback (Dict[str, Union[str, List[str]]], optional): Feedback provided from previous checks, deployments, or tests.
+            patch (bool): Whether to ask for SEARCH/REPLACE edits instead of the whole contract.
 
         Returns:
-            str: The newly generated code as a string, taking into account the provided feedback.
+            List[BaseMessage]: The chat messages.
         """
+        feedback = feedback or {}
         messages = [
             SystemMessage(content=processed_prompt),
             HumanMessage(
@@ -121,53 +241,253 @@ class SmartContractGenerator:
             HumanMessage(content=output_code),
         ]
 
-        if "check_results" in feedback and feedback["check_results"]:
+        # One deduplicated, budgeted summary instead of every raw error list
+        compacted = compact_feedback(feedback, output_code, self.feedback_token_budget)
+        if compacted:
             messages.append(
                 HumanMessage(
-                    content="The generated code failed to compile. Here is the associated error(s):"
+                    content="The previous attempt failed. Here are the issues to fix:\n"
+                    + compacted
                 )
             )
-            messages.append(
-                HumanMessage(content=str(feedback["check_results"]["errors"]))
-            )
 
-        if "deploy_results" in feedback and feedback["deploy_results"]:
-            messages.append(
-                HumanMessage(
-                    content="The generated code failed to deploy. Here is the associated error(s):"
-                )
-            )
-            messages.append(
-                HumanMessage(content=str(feedback["deploy_results"]["errors"]))
+        messages.append(
+            SystemMessage(
+                content=PATCH_INSTRUCTIONS
+                if patch
+                else "Utilize the feedback to enhance the code. Pay attention to the errors and warnings. Output only the code."
             )
+        )
+        return messages
 
-        if "test_results" in feedback and feedback["test_results"]:
-            messages.append(
-                HumanMessage(
-                    content="The deployed contract failed the security tests. Here is the associated error(s):"
-                )
-            )
-            messages.append(
-                HumanMessage(content=str(feedback["test_results"]["errors"]))
-            )
+    def repair_with_patch(
+        self,
+        processed_prompt: str,
+        output_code: str,
+        feedback: Dict[str, Union[str, List[str]]] = None,
+        sample: int = 0,
+    ) -> Union[str, None]:
+        """
+        Asks the LLM for edits to the previous code and applies them locally, so only
+        the changed lines have to be generated.
 
-        messages.append(
-            SystemMessage(
-                content="Utilize the feedback to enhance the code. Pay attention to the errors and warnings. Output only the code."
+        Args:
+            processed_prompt (str): The processed query string for which the code is generated.
+            output_code (str): The output code from the previous code generation attempt.
+            feedback (Dict[str, Union[str, List[str]]], optional): Feedback provided from previous checks, deployments, or tests.
+            sample (int): The candidate index within the current batch, see invoke().
+
+        Returns:
+            Union[str, None]: The patched code, or None if the edits could not be applied.
+        """
+        messages = self.build_feedback_messages(
+            processed_prompt, output_code, feedback, patch=True
+        )
+        # Edits are not Solidity, so they bypass the streaming code monitor
+        response = self.invoke(messages, sample=sample)
+        try:
+            return apply_patch(output_code, response)
+        except PatchError as e:
+            print(
+                f"\033[94m************** Patch Rejected, Regenerating Whole Contract: {e} **************\033[0m"
             )
+            return None
+
+    async def arepair_with_patch(
+        self,
+        processed_prompt: str,
+        output_code: str,
+        feedback: Dict[str, Union[str, List[str]]] = None,
+        sample: int = 0,
+    ) -> Union[str, None]:
+        """
+        Async variant of repair_with_patch().
+
+        Returns:
+            Union[str, None]: The patched code, or None if the edits could not be applied.
+        """
+        messages = self.build_feedback_messages(
+            processed_prompt, output_code, feedback, patch=True
+        )
+        response = await self.ainvoke(messages, sample=sample)
+        try:
+            return apply_patch(output_code, response)
+        except PatchError:
+            return None
+
+    def generate_initial_code_version(self, processed_prompt: str, sample: int = 0) -> str:
+        """
+        Generates the initial version of code based on the given processed query.
+
+        Args:
+            processed_prompt (str): The processed query string intended for code generation.
+            sample (int): The candidate index within the current batch, see invoke().
+
+        Returns:
+            str: The initially generated code as a string.
+        """
+        messages = [
+            SystemMessage(content=processed_prompt),
+        ]
+        # Implement logic to modify code generation based on feedback
+        print(
+            f"\033[94m************** Generating Smart Contract With LLM **************\033[0m"
         )
+        response = self.complete(messages, sample=sample)
+        code = self.clean_code(response)
+        logger.debug("Generated code:\n%s", code)
+        return code
+
+    def generate_code_version_with_feedback(
+        self,
+        processed_prompt: str,
+        output_code: str,
+        feedback: Dict[str, Union[str, List[str]]] = None,
+        sample: int = 0,
+    ) -> str:
+        """
+        Enhances the code generation process by utilizing feedback from previous attempts to generate a refined version of code.
+
+        Args:
+            processed_prompt (str): The processed query string for which the code is generated.
+            output_code (str): The output code from the previous code generation attempt.
+            feedback (Dict[str, Union[str, List[str]]], optional): Feedback provided from previous checks, deployments, or tests, structured as a dictionary. This feedback includes keys such as 'check_results', 'deploy_results', and 'test_results', each possibly containing a sub-dictionary with an 'errors' key that maps to a string or list of strings detailing specific issues.
+            sample (int): The candidate index within the current batch, see invoke().
+
+        Returns:
+            str: The newly generated code as a string, taking into account the provided feedback.
+        """
+        if self.repair_mode == "patch":
+            code = self.repair_with_patch(
+                processed_prompt, output_code, feedback, sample=sample
+            )
+            if code is not None:
+                return code
+
+        messages = self.build_feedback_messages(processed_prompt, output_code, feedback)
+
         # Implement logic to modify code generation based on feedback
         print(
-            f"\033[94m************** Generating Smart Contract (With Feedback) With LLM **************"
+            f"\033[94m************** Generating Smart Contract (With Feedback) With LLM **************\033[0m"
         )
-        response = self.llm(messages).content
+        response = self.complete(messages, sample=sample)
         code = self.clean_code(response)
-        # pprint.pprint(processed_prompt)
-        print("*** Changes Made By LLM ***")
-        pprint.pprint(self.difference(output_code, code))
-        print("\033[0m")
+        logger.debug("Changes made by LLM: %s", self.difference(output_code, code))
         return code
 
+    def generate_code_versions(
+        self,
+        processed_prompt: str,
+        num_versions: int = 3,
+        output_code: str = None,
+        feedback: Dict[str, Union[str, List[str]]] = None,
+    ) -> List[str]:
+        """
+        Generates several candidate versions of code concurrently.
+
+        Args:
+            processed_prompt (str): The processed query string intended for code generation.
+            num_versions (int): The number of candidates to generate.
+            output_code (str, optional): The output code from the previous attempt. When given, candidates are generated with feedback.
+            feedback (Dict[str, Union[str, List[str]]], optional): Feedback from the previous attempt, as for generate_code_version_with_feedback.
+
+        Returns:
+            List[str]: The generated candidates.
+        """
+
+        def generate(index):
+            if output_code:
+                return self.generate_code_version_with_feedback(
+                    processed_prompt, output_code, feedback=feedback, sample=index
+                )
+            return self.generate_initial_code_version(processed_prompt, sample=index)
+
+        if num_versions <= 1:
+            return [generate(0)]
+        with ThreadPoolExecutor(max_workers=num_versions) as executor:
+            return list(executor.map(generate, range(num_versions)))
+
+    async def agenerate_initial_code_version(
+        self, processed_prompt: str, sample: int = 0
+    ) -> str:
+        """
+        Async variant of generate_initial_code_version().
+
+        Args:
+            processed_prompt (str): The processed query string intended for code generation.
+            sample (int): The candidate index within the current batch, see invoke().
+
+        Returns:
+            str: The initially generated code as a string.
+        """
+        response = await self.ainvoke(
+            [SystemMessage(content=processed_prompt)], sample=sample
+        )
+        return self.clean_code(response)
+
+    async def agenerate_code_version_with_feedback(
+        self,
+        processed_prompt: str,
+        output_code: str,
+        feedback: Dict[str, Union[str, List[str]]] = None,
+        sample: int = 0,
+    ) -> str:
+        """
+        Async variant of generate_code_version_with_feedback().
+
+        Args:
+            processed_prompt (str): The processed query string for which the code is generated.
+            output_code (str): The output code from the previous code generation attempt.
+            feedback (Dict[str, Union[str, List[str]]], optional): Feedback provided from previous checks, deployments, or tests.
+            sample (int): The candidate index within the current batch, see invoke().
+
+        Returns:
+            str: The newly generated code as a string, taking into account the provided feedback.
+        """
+        if self.repair_mode == "patch":
+            code = await self.arepair_with_patch(
+                processed_prompt, output_code, feedback, sample=sample
+            )
+            if code is not None:
+                return code
+
+        messages = self.build_feedback_messages(processed_prompt, output_code, feedback)
+        response = await self.ainvoke(messages, sample=sample)
+        return self.clean_code(response)
+
+    async def agenerate_code_versions(
+        self,
+        processed_prompt: str,
+        num_versions: int = 3,
+        output_code: str = None,
+        feedback: Dict[str, Union[str, List[str]]] = None,
+    ) -> List[str]:
+        """
+        Async variant of generate_code_versions(); candidates are requested concurrently.
+
+        Args:
+            processed_prompt (str): The processed query string intended for code generation.
+            num_versions (int): The number of candidates to generate.
+            output_code (str, optional): The output code from the previous attempt.
+            feedback (Dict[str, Union[str, List[str]]], optional): Feedback from the previous attempt.
+
+        Returns:
+            List[str]: The generated candidates.
+        """
+        if output_code:
+            requests = [
+                self.agenerate_code_version_with_feedback(
+                    processed_prompt, output_code, feedback=feedback, sample=index
+                )
+                for index in range(num_versions)
+            ]
+        else:
+            requests = [
+                self.agenerate_initial_code_version(processed_prompt, sample=index)
+                for index in range(num_versions)
+            ]
+        return list(await asyncio.gather(*requests))
+
 
 if __name__ == "__main__":
     # import environment variables
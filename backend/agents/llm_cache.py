@@ -0,0 +1,212 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import List, Optional
+
+from langchain.schema import AIMessage, BaseMessage
+
+from .cache import DEFAULT_CACHE_ROOT, make_cache_key
+from .metrics import cache_requests
+
+CACHE_MODES = ("read_write", "replay", "bypass")
+
+
+class CacheMissError(Exception):
+    pass
+
+
+class LLMResponseCache:
+    """
+    A SQLite-backed store of LLM responses with a TTL and a maximum entry count.
+    Each operation opens its own connection so the cache can be shared between
+    threads and between gunicorn workers.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        ttl: float = None,
+        max_entries: int = 10000,
+    ):
+        self.path = path or os.path.join(DEFAULT_CACHE_ROOT, "llm.sqlite3")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, content TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+            )
+
+    @contextmanager
+    def _connection(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT content, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and now - row[1] > self.ttl:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return row[0]
+
+    def set(self, key: str, content: str) -> None:
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, content, now, now),
+            )
+            if self.ttl is not None:
+                connection.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+                )
+            # Least recently used entries go first once the cache is over budget
+            connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM responses")
+
+
+class CachedChatModel:
+    """
+    Wraps a chat model so responses are served from an LLMResponseCache.
+
+    Keys hash the canonical message list, model name, temperature and the caller's
+    sample index, i.e. the candidate's position within one generate_code_versions()
+    call, so the candidates of an attempt stay distinct and a repeated request
+    replays the same candidates. With temperature 0 every request is sample 0.
+
+    Modes: "read_write" serves hits and stores misses, "replay" serves hits and
+    raises CacheMissError on a miss (for offline runs), "bypass" always calls the model.
+    Only calls that reach the model are counted against the optional rate limiter.
+    """
+
+    def __init__(
+        self,
+        llm,
+        cache: LLMResponseCache,
+        model_name: str,
+        temperature: float,
+        mode: str = "read_write",
+        rate_limiter=None,
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}', expected one of {CACHE_MODES}.")
+        self.llm = llm
+        self.cache = cache
+        self.model_name = model_name
+        self.temperature = temperature
+        self.mode = mode
+        self.rate_limiter = rate_limiter
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def cache_key(self, messages: List[BaseMessage], sample: int = 0) -> str:
+        canonical = [{"type": message.type, "content": message.content} for message in messages]
+        base_key = make_cache_key(canonical, self.model_name, self.temperature)
+        return make_cache_key(base_key, sample if self.temperature else 0)
+
+    def _lookup(self, messages: List[BaseMessage], sample: int):
+        if self.mode == "bypass":
+            return None, None
+        key = self.cache_key(messages, sample)
+        content = self.cache.get(key)
+        with self._lock:
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        cache_requests.inc(cache="llm", result="miss" if content is None else "hit")
+        if content is None and self.mode == "replay":
+            raise CacheMissError("No recorded LLM response for these messages.")
+        return key, content
+
+    def _store(self, key: Optional[str], content: str) -> None:
+        if key is not None and self.mode == "read_write":
+            self.cache.set(key, content)
+
+    def invoke(self, messages: List[BaseMessage], sample: int = 0, **kwargs) -> AIMessage:
+        key, content = self._lookup(messages, sample)
+        if content is not None:
+            return AIMessage(content=content)
+        if self.rate_limiter:
+            with self.rate_limiter.slot():
+                response = self.llm.invoke(messages, **kwargs)
+        else:
+            response = self.llm.invoke(messages, **kwargs)
+        self._store(key, response.content)
+        return response
+
+    async def ainvoke(
+        self, messages: List[BaseMessage], sample: int = 0, **kwargs
+    ) -> AIMessage:
+        key, content = self._lookup(messages, sample)
+        if content is not None:
+            return AIMessage(content=content)
+        if self.rate_limiter:
+            async with self.rate_limiter.aslot():
+                response = await self.llm.ainvoke(messages, **kwargs)
+        else:
+            response = await self.llm.ainvoke(messages, **kwargs)
+        self._store(key, response.content)
+        return response
+
+    def stream(self, messages: List[BaseMessage], sample: int = 0, **kwargs):
+        """
+        Streams the response; a hit is replayed as a single chunk. What the consumer
+        read before closing the stream is what gets stored, so a replay stops at the
+        same point.
+        """
+        key, content = self._lookup(messages, sample)
+        if content is not None:
+            yield AIMessage(content=content)
+            return
+
+        received = []
+        with self.rate_limiter.slot() if self.rate_limiter else nullcontext():
+            stream = self.llm.stream(messages, **kwargs)
+            try:
+                for chunk in stream:
+                    received.append(chunk.content)
+                    yield chunk
+            except GeneratorExit:
+                self._store(key, "".join(received))
+                raise
+            finally:
+                if hasattr(stream, "close"):
+                    stream.close()
+        self._store(key, "".join(received))
+
+    __call__ = invoke
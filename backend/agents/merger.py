@@ -1,9 +1,73 @@
 # merger.py
-def select_optimal_code(generated_codes: List[str]) -> str:
+from typing import Dict, List, Tuple, Union
+
+from .compiler import check_codes
+
+
+def score_candidate(
+    check_results: Dict[str, Union[str, List[str], Dict]], deploy_gas: int = None
+) -> Tuple:
+    """
+    Scores a compiled candidate; higher tuples are better.
+
+    Candidates are ranked by compile success first, then by fewer errors, fewer
+    warnings, lower deployment gas and finally smaller bytecode.
+
+    :param check_results: The check_code() result for the candidate.
+    :param deploy_gas: The estimated deployment gas, if known.
+    :return: A tuple that sorts better candidates higher.
+    """
+    messages = check_results.get("errors", [])
+    warnings = sum(1 for message in messages if "Warning" in message.split(":", 1)[0])
+    bytecode_size = sum(
+        len(contract["bytecode"]) // 2
+        for contract in check_results.get("artifacts", {}).values()
+    )
+    return (
+        check_results.get("status") == "Success",
+        bool(check_results.get("artifacts")),
+        -(len(messages) - warnings),
+        -warnings,
+        -deploy_gas if deploy_gas is not None else float("-inf"),
+        -bytecode_size,
+    )
+
+
+def select_optimal_index(
+    generated_codes: List[str],
+    check_results: List[Dict] = None,
+    deploy_gas: List[int] = None,
+) -> int:
     """
     Selects the optimal version of the generated code based on given criteria.
 
     :param generated_codes: A list of strings, each representing a version of generated code.
+    :param check_results: The check_code() result per version; compiled in one batch if omitted.
+    :param deploy_gas: The estimated deployment gas per version, None where unknown.
+    :return: The index of the selected version, which stays unambiguous when several
+        versions have the same code.
+    """
+    if check_results is None:
+        check_results = check_codes(generated_codes)
+    if deploy_gas is None:
+        deploy_gas = [None] * len(generated_codes)
+
+    return max(
+        range(len(generated_codes)),
+        key=lambda index: score_candidate(check_results[index], deploy_gas[index]),
+    )
+
+
+def select_optimal_code(
+    generated_codes: List[str],
+    check_results: List[Dict] = None,
+    deploy_gas: List[int] = None,
+) -> str:
+    """
+    Selects the optimal version of the generated code, see select_optimal_index.
+
     :return: The selected optimal version of code.
     """
-    pass
+    return generated_codes[
+        select_optimal_index(generated_codes, check_results, deploy_gas)
+    ]
@@ -0,0 +1,171 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# Bucket upper bounds in seconds, from a cached compile to a slow LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> LabelValues:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelValues, extra: Dict[str, str] = None) -> str:
+    pairs = list(labels) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    rendered = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in pairs
+    )
+    return "{" + rendered + "}"
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(labels)} {value}"
+                for labels, value in sorted(self._values.items())
+            ]
+
+
+class Histogram:
+    """Observations bucketed per label set, e.g. stage durations."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._values: Dict[LabelValues, Dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._values.setdefault(
+                key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            )
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for labels, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(
+                        f"{self.name}_bucket{_format_labels(labels, {'le': bound})} {count}"
+                    )
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(labels, {'le': '+Inf'})} {series['count']}"
+                )
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return lines
+
+
+class Gauge:
+    """A value read when metrics are rendered, e.g. the compile pool's queue depth."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, read: Callable[[], Dict[LabelValues, float]]):
+        self.name = name
+        self.description = description
+        self.read = read
+
+    def render(self) -> List[str]:
+        try:
+            values = self.read()
+        except Exception:
+            return []
+        return [
+            f"{self.name}{_format_labels(labels)} {value}"
+            for labels, value in sorted(values.items())
+        ]
+
+
+_registry: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        return _registry.setdefault(metric.name, metric)
+
+
+def counter(name: str, description: str) -> Counter:
+    return _register(Counter(name, description))
+
+
+def histogram(name: str, description: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, description, buckets))
+
+
+def gauge(name: str, description: str, read: Callable[[], Dict]) -> Gauge:
+    return _register(Gauge(name, description, read))
+
+
+stage_duration = histogram(
+    "sc_stage_duration_seconds", "Time spent per pipeline stage."
+)
+stage_failures = counter(
+    "sc_stage_failures_total", "Stage outcomes other than success, by stage and class."
+)
+attempts_total = counter("sc_pipeline_attempts_total", "Generate/check/deploy attempts.")
+pipelines_total = counter("sc_pipelines_total", "Finished pipeline runs by outcome.")
+cache_requests = counter("sc_cache_requests_total", "Cache lookups by cache and result.")
+
+
+@contextmanager
+def timer(stage: str, **labels) -> Iterator[None]:
+    """
+    Records how long the block takes in sc_stage_duration_seconds, and counts it in
+    sc_stage_failures_total, labelled with the exception class, if it raises.
+
+    :param stage: The stage name, e.g. "llm" or "compile".
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        stage_failures.inc(stage=stage, failure=type(e).__name__, **labels)
+        raise
+    finally:
+        stage_duration.observe(time.perf_counter() - start, stage=stage, **labels)
+
+
+def render_metrics() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
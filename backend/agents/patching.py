@@ -0,0 +1,177 @@
+import difflib
+import re
+from typing import List, Optional, Tuple
+
+from .precheck import precheck_code
+
+PATCH_INSTRUCTIONS = """Utilize the feedback to fix the code. Do not output the whole contract. Output only the edits, as one or more blocks of this form:
+<<<<<<< SEARCH
+the exact lines of the previous code to replace
+=======
+the new lines
+>>>>>>> REPLACE
+Each SEARCH section must match the previous code, including enough lines to be unique."""
+
+_SEARCH_REPLACE_BLOCK = re.compile(
+    r"^<{5,}\s*SEARCH\s*\n(.*?)^={5,}\s*\n(.*?)^>{5,}\s*REPLACE\s*$",
+    re.MULTILINE | re.DOTALL,
+)
+
+# How similar a window of the code must be to a SEARCH section to count as a match
+DEFAULT_MATCH_THRESHOLD = 0.85
+
+
+class PatchError(Exception):
+    pass
+
+
+def parse_search_replace(text: str) -> List[Tuple[str, str]]:
+    """
+    Extracts SEARCH/REPLACE edit blocks.
+
+    :param text: The LLM response.
+    :return: (search, replace) pairs in order.
+    """
+    return [(search, replace) for search, replace in _SEARCH_REPLACE_BLOCK.findall(text)]
+
+
+def parse_unified_diff(text: str) -> List[Tuple[str, str]]:
+    """
+    Turns the hunks of a unified diff into (search, replace) pairs. Line numbers in
+    hunk headers are ignored: hunks are located by their content, which survives the
+    miscounted headers LLMs tend to produce.
+
+    :param text: The LLM response.
+    :return: (search, replace) pairs in order.
+    """
+    edits = []
+    old: Optional[List[str]] = None
+    new: List[str] = []
+
+    def flush():
+        if old is not None and (old or new):
+            edits.append(("".join(old), "".join(new)))
+
+    for line in text.splitlines(keepends=True):
+        if line.startswith("@@"):
+            flush()
+            old, new = [], []
+        elif old is None or line.startswith(("---", "+++", "```", "\\")):
+            continue
+        elif line.startswith("-"):
+            old.append(line[1:])
+        elif line.startswith("+"):
+            new.append(line[1:])
+        else:
+            # Context lines; a bare newline is an empty context line
+            content = line[1:] if line.startswith(" ") else line
+            old.append(content)
+            new.append(content)
+    flush()
+    return edits
+
+
+def parse_patch(text: str) -> List[Tuple[str, str]]:
+    """
+    Extracts edits from an LLM response in either SEARCH/REPLACE or unified diff form.
+
+    :param text: The LLM response.
+    :return: (search, replace) pairs in order.
+    """
+    edits = parse_search_replace(text) or parse_unified_diff(text)
+    if not edits:
+        raise PatchError("The response contains no SEARCH/REPLACE blocks or diff hunks.")
+    return edits
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _locate(lines: List[str], search: List[str], threshold: float) -> Tuple[int, int]:
+    """Returns the [start, end) line range of the code that best matches search."""
+    size = len(search)
+    # Exact match first, then one that ignores whitespace differences
+    for key in (lambda line: line.rstrip(), _normalize):
+        wanted = [key(line) for line in search]
+        matches = [
+            start
+            for start in range(len(lines) - size + 1)
+            if [key(line) for line in lines[start : start + size]] == wanted
+        ]
+        if len(matches) == 1:
+            return matches[0], matches[0] + size
+        if len(matches) > 1:
+            raise PatchError(f"The edit matches {len(matches)} places:\n{''.join(search)}")
+
+    # Fuzzy: the most similar window of the same length
+    wanted = "\n".join(_normalize(line) for line in search)
+    best_ratio, best_start = 0.0, None
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    matcher.set_seq2(wanted)
+    for start in range(len(lines) - size + 1):
+        matcher.set_seq1("\n".join(_normalize(line) for line in lines[start : start + size]))
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio > best_ratio:
+            best_ratio, best_start = ratio, start
+    if best_start is None or best_ratio < threshold:
+        raise PatchError(f"The edit does not match the code:\n{''.join(search)}")
+    return best_start, best_start + size
+
+
+def apply_edits(
+    code: str, edits: List[Tuple[str, str]], threshold: float = DEFAULT_MATCH_THRESHOLD
+) -> str:
+    """
+    Applies (search, replace) edits to code in order, tolerating whitespace
+    differences and small deviations in the search text.
+
+    :param code: The code to patch.
+    :param edits: The edits, e.g. from parse_patch().
+    :param threshold: The minimum difflib similarity for a fuzzy match.
+    :return: The patched code.
+    """
+    lines = code.splitlines(keepends=True)
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    for search, replace in edits:
+        search_lines = search.splitlines(keepends=True)
+        # Leading/trailing blank lines are not worth matching on
+        while search_lines and not search_lines[0].strip():
+            search_lines.pop(0)
+        while search_lines and not search_lines[-1].strip():
+            search_lines.pop()
+        if not search_lines:
+            raise PatchError("An edit has an empty SEARCH section.")
+
+        start, end = _locate(lines, search_lines, threshold)
+        replace_lines = replace.splitlines(keepends=True)
+        if replace_lines and not replace_lines[-1].endswith("\n"):
+            replace_lines[-1] += "\n"
+        lines[start:end] = replace_lines
+    return "".join(lines)
+
+
+def validate_patched_code(original: str, patched: str) -> None:
+    """Rejects patches that made no change or left the contract structurally broken."""
+    if patched.strip() == original.strip():
+        raise PatchError("The patch does not change the code.")
+    errors = precheck_code(patched)
+    if errors:
+        raise PatchError(f"The patched code is broken: {errors[0]['message']}")
+
+
+def apply_patch(code: str, response: str, threshold: float = DEFAULT_MATCH_THRESHOLD) -> str:
+    """
+    Parses an LLM edit response, applies it to code and validates the result.
+
+    :param code: The previous attempt's code.
+    :param response: The LLM response with SEARCH/REPLACE blocks or a unified diff.
+    :param threshold: The minimum difflib similarity for a fuzzy match.
+    :return: The patched code. Raises PatchError if the patch can't be used.
+    """
+    patched = apply_edits(code, parse_patch(response), threshold)
+    validate_patched_code(code, patched)
+    return patched
@@ -0,0 +1,258 @@
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Tuple, Union
+
+import requests
+
+from .autofix import autofix_candidates
+from .chain import DEFAULT_RPC_URL
+from .compile_service import CompilerBusyError
+from .compiler import check_codes, submit_static_analyses
+from .deploy_backends import get_deploy_backend
+from .deployer_v1 import deploy_contract, estimate_deploy_gas, select_deploy_target
+from .llm import SmartContractGenerator
+from .merger import select_optimal_index
+from .metrics import attempts_total, pipelines_total, timer
+from .query import process_query
+from .smoke import smoke_test_contract
+
+
+class PipelineCancelled(Exception):
+    pass
+
+
+def deploy_and_smoke_test(
+    code: str, artifacts: Dict[str, Dict], revert: bool = True
+) -> Tuple[Dict, Dict]:
+    """
+    Deploys the code and smoke tests it within one chain lease.
+
+    :param revert: Whether the chain is reverted afterwards. Without reverting, the
+        deploy can serve as the final one.
+    :return: The deploy results, and the smoke test results if the deploy succeeded.
+    """
+    try:
+        with get_deploy_backend().lease(revert=revert) as chain:
+            deploy_results = deploy_contract(code, artifacts, chain)
+            if deploy_results["status"] != "Success":
+                return deploy_results, None
+            return deploy_results, smoke_test_contract(
+                chain,
+                deploy_results["contract_address"],
+                select_deploy_target(artifacts, code)["abi"],
+            )
+    except requests.exceptions.ConnectionError:
+        return {
+            "status": "Failure",
+            "errors": [
+                f"Connection error. Make sure Ganache is running at {DEFAULT_RPC_URL}. You can start Ganache using this command in terminal: ganache-cli"
+            ],
+        }, None
+
+
+def run_pipeline(
+    generator: SmartContractGenerator,
+    prompt: str,
+    max_retries: int = 5,
+    num_candidates: int = 3,
+    use_feedback: bool = True,
+    prompt_file: str = "../prompts/sc-generation-2.txt",
+    on_event: Callable[[Dict], None] = None,
+    cancel_event: threading.Event = None,
+    final_deploy: bool = False,
+    smoke_test: bool = False,
+    static_analysis: bool = False,
+    autofix: bool = True,
+) -> Dict[str, Union[bool, str, int, Dict]]:
+    """
+    Runs the generate -> check -> deploy loop until a contract deploys or retries run out.
+
+    Every attempt generates num_candidates versions concurrently, compiles them in one
+    batch and validates the best-scoring one with a dry-run deploy, which simulates the
+    creation transaction instead of mining it. Only the winning code is really deployed,
+    and only when final_deploy is set. With smoke_test, an attempt that passes the dry
+    run is also deployed and its view/pure functions are called, which also catches
+    contracts that deploy but do not work. With final_deploy as well, that deploy is
+    kept on chain and becomes the final one, so the winner is only mined once.
+
+    :param generator: The LLM code generator.
+    :param prompt: The user's prompt.
+    :param max_retries: The maximum number of attempts.
+    :param num_candidates: The number of candidates generated per attempt.
+    :param use_feedback: Whether retries are generated from the previous attempt's feedback.
+    :param prompt_file: The prompt template passed to process_query.
+    :param on_event: Called with a progress event dictionary at the start and end of
+        every stage: "attempt_start", "llm_start", "llm_finish", "compile_result" and
+        "deploy_result". Finishing events carry the stage's "elapsed" seconds.
+    :param cancel_event: When set, the pipeline raises PipelineCancelled before its next stage.
+    :param final_deploy: Whether the valid code is deployed for real once found, emitting
+        a "deploy_result" event with "final" set. Its results replace the dry run's.
+    :param smoke_test: Whether attempts are smoke tested, emitting a "test_result" event.
+        Failures are fed back to the next attempt as "test_results".
+    :param static_analysis: Whether Slither runs on compiled attempts, concurrently with
+        the deploy. When another attempt will be fed back the findings, they are awaited
+        for at most SC_SLITHER_WAIT seconds (default 30); otherwise they are only
+        returned if already finished. Dropped analyses are still cached for reruns.
+    :param autofix: Whether failed candidates are first repaired with the local rules
+        for common solc diagnostics and rechecked, emitting an "autofix" event with the
+        fixes applied per candidate.
+    :return: A dictionary with "valid_code", "generated_code", "check_results",
+        "deploy_results", "test_results", "analysis_results" and "attempts".
+    """
+    valid_output = False
+    generated_code, check_results, deploy_results, test_results = None, None, None, None
+    analysis_results = None
+    attempt_count = 0
+    feedback = {}
+
+    def emit(event: str, **data) -> None:
+        if cancel_event is not None and cancel_event.is_set():
+            pipelines_total.inc(outcome="cancelled")
+            raise PipelineCancelled("The request was cancelled.")
+        if on_event is not None:
+            on_event({"event": event, "attempt": attempt_count, **data})
+
+    with timer("process_query"):
+        processed_query = process_query(prompt, prompt_file=prompt_file)
+
+    while not valid_output and attempt_count < max_retries:
+        attempt_count += 1
+        attempts_total.inc()
+        emit("attempt_start", max_retries=max_retries)
+
+        emit("llm_start", num_candidates=num_candidates)
+        stage_start = time.time()
+        generated_codes = generator.generate_code_versions(
+            processed_query,
+            num_versions=num_candidates,
+            output_code=generated_code if use_feedback else None,
+            feedback=feedback,
+        )
+        emit("llm_finish", elapsed=time.time() - stage_start)
+
+        stage_start = time.time()
+        candidate_results = check_codes(generated_codes)
+        busy = next((r for r in candidate_results if r["status"] == "Busy"), None)
+        if busy:
+            pipelines_total.inc(outcome="busy")
+            raise CompilerBusyError(busy["errors"][0])
+        if autofix:
+            # Mechanical fixes cost a recompile instead of an LLM round-trip
+            generated_codes, candidate_results, fixes = autofix_candidates(
+                generated_codes, candidate_results
+            )
+            if any(fixes):
+                emit("autofix", fixes=fixes)
+
+        deploy_gas: List[int] = [
+            estimate_deploy_gas(result.get("artifacts"), code=code)
+            if result["status"] == "Success" and len(generated_codes) > 1
+            else None
+            for code, result in zip(generated_codes, candidate_results)
+        ]
+        best_index = select_optimal_index(generated_codes, candidate_results, deploy_gas)
+        generated_code = generated_codes[best_index]
+        check_results = candidate_results[best_index]
+        feedback = {"check_results": check_results}
+        emit(
+            "compile_result",
+            status=check_results["status"],
+            errors=check_results["errors"],
+            elapsed=time.time() - stage_start,
+        )
+
+        if check_results["status"] == "Success":
+            stage_start = time.time()
+            test_results, analysis_results = None, None
+            analysis = submit_static_analyses(generated_code) if static_analysis else None
+            deploy_results = deploy_contract(
+                generated_code,
+                artifacts=check_results.get("artifacts"),
+                dry_run=True,
+                gas_estimate=deploy_gas[best_index],
+            )
+            feedback["deploy_results"] = deploy_results
+            emit(
+                "deploy_result",
+                status=deploy_results["status"],
+                errors=deploy_results["errors"],
+                contract_address=deploy_results.get("contract_address"),
+                elapsed=time.time() - stage_start,
+            )
+
+            if smoke_test and deploy_results["status"] == "Success":
+                # Only mine attempts that already passed the dry run
+                test_deploy, test_results = deploy_and_smoke_test(
+                    generated_code, check_results.get("artifacts"), revert=not final_deploy
+                )
+                if test_results is None:
+                    test_results = {
+                        "status": "Failure",
+                        "errors": test_deploy["errors"],
+                        "warnings": [],
+                        "functions": {},
+                    }
+                feedback["test_results"] = test_results
+                emit(
+                    "test_result",
+                    status=test_results["status"],
+                    errors=test_results["errors"],
+                    warnings=test_results["warnings"],
+                )
+
+            if deploy_results["status"] == "Success" and (
+                test_results is None or test_results["status"] == "Success"
+            ):
+                valid_output = True
+
+            if analysis is not None:
+                # Only a following attempt uses the findings, so the response is not
+                # held up for them when there is none
+                if use_feedback and not valid_output and attempt_count < max_retries:
+                    try:
+                        analysis_results = analysis.result(
+                            timeout=float(os.environ.get("SC_SLITHER_WAIT", "30"))
+                        )
+                    except FutureTimeoutError:
+                        analysis_results = None
+                elif analysis.done():
+                    analysis_results = analysis.result()
+            if analysis_results is not None:
+                feedback["analysis_results"] = analysis_results
+                emit(
+                    "analysis_result",
+                    status=analysis_results["status"],
+                    errors=analysis_results["errors"],
+                )
+
+    if valid_output and final_deploy:
+        stage_start = time.time()
+        if test_results is not None:
+            # The smoke test's deploy was kept on chain
+            deploy_results = test_deploy
+        else:
+            deploy_results = deploy_contract(
+                generated_code, artifacts=check_results.get("artifacts")
+            )
+        valid_output = deploy_results["status"] == "Success"
+        emit(
+            "deploy_result",
+            status=deploy_results["status"],
+            errors=deploy_results["errors"],
+            contract_address=deploy_results.get("contract_address"),
+            elapsed=time.time() - stage_start,
+            final=True,
+        )
+
+    pipelines_total.inc(outcome="valid" if valid_output else "invalid")
+    return {
+        "valid_code": valid_output,
+        "generated_code": generated_code,
+        "check_results": check_results,
+        "deploy_results": deploy_results,
+        "test_results": test_results,
+        "analysis_results": analysis_results,
+        "attempts": attempt_count,
+    }
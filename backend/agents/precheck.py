@@ -0,0 +1,148 @@
+import re
+from typing import Dict, List, Tuple
+
+_BRACKETS = {"{": "}", "(": ")", "[": "]"}
+_CLOSERS = {closer: opener for opener, closer in _BRACKETS.items()}
+
+_DECLARATION = re.compile(r"\b(contract|interface|library)\s+[A-Za-z_$][\w$]*")
+_PRAGMA = re.compile(r"\bpragma\s+solidity\b")
+# Comments LLMs leave in place of code they did not write out. Apart from a leading
+# ellipsis, the whole comment must be the placeholder: prose such as "send the rest
+# of the contract balance" is legitimate
+_PLACEHOLDER_COMMENT = re.compile(
+    r"^(//|/\*)\s*(\.\.\."
+    r"|((the )?rest of (the )?(code|contract|functions?)( (goes )?here)?"
+    r"|((add )?(your|more) (code|logic)|implementation) (goes )?here)\.*\s*(\*/)?\s*$)",
+    re.IGNORECASE,
+)
+
+
+def _tokenize(code: str) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]], str]:
+    """
+    Splits code into bracket tokens and comments, skipping string literals.
+
+    :return: The (bracket, offset) tokens, the (comment, offset) comments and the code
+        with comments and string contents blanked out.
+    """
+    brackets, comments = [], []
+    blanked = list(code)
+    index, length = 0, len(code)
+    while index < length:
+        char = code[index]
+        if code.startswith("//", index):
+            end = code.find("\n", index)
+            end = length if end == -1 else end
+            comments.append((code[index:end], index))
+            blanked[index:end] = " " * (end - index)
+            index = end
+        elif code.startswith("/*", index):
+            end = code.find("*/", index + 2)
+            end = length if end == -1 else end + 2
+            comments.append((code[index:end], index))
+            blanked[index:end] = [c if c == "\n" else " " for c in code[index:end]]
+            index = end
+        elif char in "\"'":
+            end = index + 1
+            while end < length and code[end] != char and code[end] != "\n":
+                end += 2 if code[end] == "\\" else 1
+            blanked[index + 1 : end] = " " * (min(end, length) - index - 1)
+            index = end + 1
+        else:
+            if char in _BRACKETS or char in _CLOSERS:
+                brackets.append((char, index))
+            index += 1
+    return brackets, comments, "".join(blanked)
+
+
+def _diagnostic(code: str, offset: int, error_type: str, message: str) -> Dict:
+    line = code.count("\n", 0, offset) + 1
+    column = offset - (code.rfind("\n", 0, offset) + 1) + 1
+    start = len(code[:offset].encode("utf-8"))
+    return {
+        "severity": "error",
+        "type": error_type,
+        "code": None,
+        "message": message,
+        "start": start,
+        "end": start + 1,
+        "formattedMessage": f"{error_type}: {message}\n --> Contract.sol:{line}:{column}:\n",
+    }
+
+
+def precheck_code(code: str) -> List[Dict]:
+    """
+    Cheap structural validation that catches output solc could never compile, so it
+    doesn't cost a compiler process: prose without code, leftover Markdown fences,
+    unbalanced brackets, a missing pragma or contract declaration, and placeholders
+    standing in for code.
+
+    :param code: The (normalized) Solidity source code.
+    :return: solc-shaped diagnostics ("severity", "type", "message", byte offsets and a
+        "formattedMessage"); empty if the code may compile.
+    """
+    if not code.strip():
+        return [_diagnostic(code, 0, "ParserError", "The response contains no code.")]
+
+    brackets, comments, blanked = _tokenize(code)
+    diagnostics = []
+
+    fence = blanked.find("```")
+    if fence != -1:
+        diagnostics.append(
+            _diagnostic(code, fence, "ParserError", "Stray Markdown code fence in the source.")
+        )
+
+    stack: List[Tuple[str, int]] = []
+    for char, offset in brackets:
+        if char in _BRACKETS:
+            stack.append((char, offset))
+        elif stack and stack[-1][0] == _CLOSERS[char]:
+            stack.pop()
+        else:
+            diagnostics.append(
+                _diagnostic(code, offset, "ParserError", f"Unmatched '{char}'.")
+            )
+            break
+    else:
+        if stack:
+            char, offset = stack[-1]
+            diagnostics.append(
+                _diagnostic(
+                    code,
+                    offset,
+                    "ParserError",
+                    f"'{char}' is never closed; expected '{_BRACKETS[char]}' before the end of the source.",
+                )
+            )
+
+    if not _PRAGMA.search(blanked):
+        diagnostics.append(
+            _diagnostic(
+                code, 0, "SyntaxError", "Source file does not specify the required compiler version (pragma solidity)."
+            )
+        )
+    if not _DECLARATION.search(blanked):
+        diagnostics.append(
+            _diagnostic(
+                code, 0, "ParserError", "No contract, interface or library declaration found."
+            )
+        )
+
+    ellipsis = blanked.find("...")
+    if ellipsis != -1:
+        diagnostics.append(
+            _diagnostic(code, ellipsis, "ParserError", "Placeholder '...' instead of code.")
+        )
+    for comment, offset in comments:
+        if _PLACEHOLDER_COMMENT.search(comment):
+            diagnostics.append(
+                _diagnostic(
+                    code,
+                    offset,
+                    "ParserError",
+                    f"Placeholder comment instead of code: {comment.strip()[:80]}",
+                )
+            )
+            break
+
+    return diagnostics
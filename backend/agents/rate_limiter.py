@@ -0,0 +1,95 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict
+
+
+class RateLimiter:
+    """
+    Caps both the number of in-flight LLM requests (a semaphore) and the request
+    rate (a token bucket). Built on threading primitives so the sync and async
+    code paths draw from the same budget and cannot oversubscribe each other.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        requests_per_minute: float = 60,
+        burst: int = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.capacity = burst or max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def _reserve_token(self) -> float:
+        """Takes a token if one is available; otherwise returns how long to wait for one."""
+        with self._lock:
+            now = time.monotonic()
+            rate = self.requests_per_minute / 60.0
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / rate
+
+    @contextmanager
+    def slot(self):
+        """Blocks until a request may be sent, holding a concurrency slot for its duration."""
+        self._semaphore.acquire()
+        try:
+            wait = self._reserve_token()
+            while wait > 0:
+                time.sleep(wait)
+                wait = self._reserve_token()
+            yield
+        finally:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """The async counterpart of slot(); waits without blocking the event loop."""
+        delay = 0.01
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+        try:
+            wait = self._reserve_token()
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self._reserve_token()
+            yield
+        finally:
+            self._semaphore.release()
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    model_name: str, max_concurrency: int = None, requests_per_minute: float = None
+) -> RateLimiter:
+    """
+    Returns the process-wide limiter for a model, creating it on first use.
+
+    :param model_name: The LLM model name; every generator using it shares one limiter.
+    :param max_concurrency: In-flight request cap, defaulting to SC_LLM_MAX_CONCURRENCY.
+    :param requests_per_minute: Request rate cap, defaulting to SC_LLM_RPM.
+    :return: The model's RateLimiter.
+    """
+    with _limiters_lock:
+        if model_name not in _limiters:
+            _limiters[model_name] = RateLimiter(
+                max_concurrency=max_concurrency
+                or int(os.environ.get("SC_LLM_MAX_CONCURRENCY", "4")),
+                requests_per_minute=requests_per_minute
+                or float(os.environ.get("SC_LLM_RPM", "60")),
+            )
+        return _limiters[model_name]
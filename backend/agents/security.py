@@ -0,0 +1,162 @@
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .cache import DEFAULT_CACHE_ROOT, DiskLRUCache, make_cache_key
+from .metrics import cache_requests, timer
+
+
+def _format_issue(issue: Dict) -> str:
+    location = f" in {issue['function']}" if issue.get("function") else ""
+    return f"SWC-{issue['swc_id']} {issue['title']} ({issue['severity']}){location}: {issue['description']}"
+
+
+def parse_mythril_output(output: str) -> List[Dict]:
+    """
+    Parses the JSON report of `myth analyze -o json` into structured issues.
+
+    :param output: Mythril's stdout.
+    :return: The issues, each with swc_id, title, severity, function, address and description.
+    """
+    report = json.loads(output)
+    if report.get("error"):
+        raise RuntimeError(report["error"])
+    return [
+        {
+            "swc_id": issue.get("swc-id"),
+            "title": issue.get("title"),
+            "severity": issue.get("severity"),
+            "function": issue.get("function"),
+            "address": issue.get("address"),
+            "description": " ".join(
+                (issue.get("description") or "").split()
+            ),
+        }
+        for issue in report.get("issues", [])
+    ]
+
+
+class MythrilRunner:
+    """
+    Runs Mythril on compiled bytecode with bounded symbolic execution. Each analysis
+    is a separate myth process; at most max_workers run at once, so analyses overlap
+    with other requests without oversubscribing the machine. Reports are cached by
+    bytecode hash, since the same contract always yields the same issues.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        execution_timeout: int = 60,
+        max_depth: int = 22,
+        cache: DiskLRUCache = None,
+        command: List[str] = None,
+    ):
+        self.execution_timeout = execution_timeout
+        self.max_depth = max_depth
+        self.cache = cache if cache is not None else DiskLRUCache()
+        self.command = command or ["myth"]
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="mythril"
+        )
+
+    def _run(self, bytecode: str) -> Dict:
+        bytecode = bytecode[2:] if bytecode.startswith("0x") else bytecode
+        cache_key = make_cache_key(
+            "mythril", bytecode, self.execution_timeout, self.max_depth
+        )
+        cached = self.cache.get(cache_key)
+        cache_requests.inc(cache="mythril", result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+
+        command = self.command + [
+            "analyze",
+            "-c",
+            bytecode,
+            "-o",
+            "json",
+            "--execution-timeout",
+            str(self.execution_timeout),
+            "--max-depth",
+            str(self.max_depth),
+        ]
+        result = None
+        try:
+            # Mythril exits non-zero when it finds issues, so the report is what counts
+            with timer("mythril"):
+                result = subprocess.run(
+                    command,
+                    capture_output=True,
+                    text=True,
+                    # Leave Mythril time to report once its execution budget is spent
+                    timeout=self.execution_timeout * 2 + 30,
+                )
+            issues = parse_mythril_output(result.stdout)
+        except subprocess.TimeoutExpired:
+            return {
+                "status": "Error",
+                "errors": [
+                    f"Mythril did not finish within {self.execution_timeout * 2 + 30} seconds."
+                ],
+                "issues": [],
+            }
+        except Exception as e:
+            stderr = result.stderr.strip() if result is not None else ""
+            return {
+                "status": "Error",
+                "errors": [f"Mythril failed to execute: {stderr or e}"],
+                "issues": [],
+            }
+
+        report = {
+            "status": "Failure" if issues else "Success",
+            "errors": [_format_issue(issue) for issue in issues],
+            "issues": issues,
+        }
+        self.cache.set(cache_key, report)
+        return report
+
+    def submit(self, bytecode: str) -> "Future[Dict]":
+        """
+        Queues an analysis without waiting for it.
+
+        :param bytecode: The contract's creation bytecode, hex encoded.
+        :return: A future resolving to the report: "status" ("Success", "Failure" when
+            issues were found, or "Error"), "errors" and structured "issues".
+        """
+        return self._executor.submit(self._run, bytecode)
+
+    def analyze(self, bytecode: str) -> Dict:
+        """Analyzes bytecode and waits for the report, see submit()."""
+        return self.submit(bytecode).result()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_runner: Optional[MythrilRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_mythril_runner() -> MythrilRunner:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = MythrilRunner(
+                max_workers=int(os.environ.get("SC_MYTHRIL_WORKERS", "2")),
+                execution_timeout=int(os.environ.get("SC_MYTHRIL_TIMEOUT", "60")),
+                max_depth=int(os.environ.get("SC_MYTHRIL_MAX_DEPTH", "22")),
+                cache=DiskLRUCache(
+                    directory=os.environ.get(
+                        "SC_MYTHRIL_CACHE_DIR",
+                        os.path.join(DEFAULT_CACHE_ROOT, "mythril"),
+                    ),
+                    max_entries=256,
+                    max_disk_bytes=16 * 1024 * 1024,
+                ),
+            )
+        return _runner
@@ -0,0 +1,146 @@
+from typing import Dict, List, Tuple
+
+from eth_abi import decode, encode
+from eth_utils import keccak, to_hex
+
+from .abi_values import synthesize_arguments
+from .chain import get_session
+from .deploy_backends import ChainLease
+from .metrics import stage_failures, timer
+
+# Error(string) and Panic(uint256) revert payload selectors
+_ERROR_SELECTOR = "0x08c379a0"
+_PANIC_SELECTOR = "0x4e487b71"
+
+
+def canonical_type(param: Dict) -> str:
+    """Returns the ABI type of a parameter as used in signatures, expanding tuples."""
+    param_type = param["type"]
+    if param_type.startswith("tuple"):
+        components = ",".join(canonical_type(c) for c in param["components"])
+        return f"({components}){param_type[len('tuple'):]}"
+    return param_type
+
+
+def _signature(entry: Dict) -> str:
+    types = ",".join(canonical_type(param) for param in entry["inputs"])
+    return f"{entry['name']}({types})"
+
+
+def _decode_revert(data: str) -> str:
+    if not data or data == "0x":
+        return "reverted without a reason"
+    try:
+        if data.startswith(_ERROR_SELECTOR):
+            return decode(["string"], bytes.fromhex(data[10:]))[0]
+        if data.startswith(_PANIC_SELECTOR):
+            return f"panic code {hex(decode(['uint256'], bytes.fromhex(data[10:]))[0])}"
+    except Exception:
+        pass
+    return f"reverted with data {data}"
+
+
+def _call_batch(chain: ChainLease, calls: List[Dict]) -> List[Tuple[str, str]]:
+    """
+    Runs eth_calls and returns (result, error) pairs in order. RPC chains get a
+    single JSON-RPC batch request; in-process chains are called directly.
+    """
+    if not calls:
+        return []
+    if chain.endpoint:
+        batch = [
+            {"jsonrpc": "2.0", "id": index, "method": "eth_call", "params": [call, "latest"]}
+            for index, call in enumerate(calls)
+        ]
+        response = get_session(chain.endpoint).post(chain.endpoint, json=batch, timeout=30)
+        response.raise_for_status()
+        replies = {reply["id"]: reply for reply in response.json()}
+        results = []
+        for index in range(len(calls)):
+            reply = replies.get(index, {"error": {"message": "no response"}})
+            if "error" in reply:
+                error = reply["error"]
+                data = error.get("data")
+                # Ganache nests the revert data under the transaction hash
+                if isinstance(data, dict):
+                    data = data.get("data") or next(
+                        (v.get("return") for v in data.values() if isinstance(v, dict)),
+                        None,
+                    )
+                results.append((None, _decode_revert(data) if data else error.get("message")))
+            else:
+                results.append((reply["result"], None))
+        return results
+
+    results = []
+    for call in calls:
+        try:
+            results.append((to_hex(chain.w3.eth.call(call)), None))
+        except Exception as e:
+            data = getattr(e, "data", None)
+            results.append((None, _decode_revert(data) if isinstance(data, str) else str(e)))
+    return results
+
+
+def smoke_test_contract(
+    chain: ChainLease, contract_address: str, abi: List[Dict], strategy: str = "typical"
+) -> Dict:
+    """
+    Calls every view and pure function of a deployed contract with synthesized arguments
+    and checks that it returns data that decodes against its declared outputs.
+
+    Output that does not decode fails the test. Reverts are only warnings: they may be
+    caused by the synthesized arguments, and correct getters often require state
+    (e.g. a winner only once voting ended) or a particular caller.
+
+    :param chain: The chain the contract is deployed on.
+    :param contract_address: The address of the deployed contract.
+    :param abi: The contract's ABI.
+    :param strategy: The argument value strategy, see abi_values.synthesize_value.
+    :return: A dictionary containing the status, errors, warnings and per-function results.
+    """
+    errors, warnings, calls, entries = [], [], [], []
+    for entry in abi:
+        if entry.get("type") != "function" or entry.get("stateMutability") not in (
+            "view",
+            "pure",
+        ):
+            continue
+        signature = _signature(entry)
+        try:
+            args = synthesize_arguments(entry["inputs"], strategy, chain.account)
+            data = keccak(text=signature)[:4] + encode(
+                [canonical_type(param) for param in entry["inputs"]], args
+            )
+        except Exception as e:
+            warnings.append(f"{signature}: skipped, {e}")
+            continue
+        entries.append((signature, entry))
+        calls.append({"from": chain.account, "to": contract_address, "data": to_hex(data)})
+
+    with timer("smoke_test"):
+        outputs = _call_batch(chain, calls)
+    functions = {}
+    for (signature, entry), (result, error) in zip(entries, outputs):
+        if error is not None:
+            functions[signature] = {"status": "Reverted", "error": error}
+            warnings.append(f"{signature} reverted: {error}")
+            continue
+        try:
+            decode(
+                [canonical_type(param) for param in entry.get("outputs", [])],
+                bytes.fromhex(result[2:]),
+            )
+            functions[signature] = {"status": "Success"}
+        except Exception as e:
+            functions[signature] = {"status": "DecodeError", "error": str(e)}
+            errors.append(f"{signature} returned data that does not match its outputs: {e}")
+
+    if errors:
+        stage_failures.inc(stage="smoke_test", failure="failed_calls")
+    return {
+        "status": "Failure" if errors else "Success",
+        "errors": errors,
+        "warnings": warnings,
+        "functions": functions,
+    }
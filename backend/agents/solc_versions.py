@@ -0,0 +1,232 @@
+import functools
+import glob
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+Version = Tuple[int, int, int]
+
+_install_lock = threading.Lock()
+# When each version last failed to install, so unresolvable pragmas don't run
+# solc-select on every compile; retried after SC_SOLC_INSTALL_RETRY seconds
+_failed_installs: Dict[Version, float] = {}
+
+_VERSION_PATTERN = r"v?\d+(?:\.\d+){0,2}"
+_HYPHEN_RANGE = re.compile(rf"({_VERSION_PATTERN})\s+-\s+({_VERSION_PATTERN})")
+
+
+class SolcNotFoundError(Exception):
+    pass
+
+
+def parse_version(version: str) -> Version:
+    """
+    Parses a possibly partial version string such as "0.8" or "v0.8.19" into a triple.
+
+    :param version: The version string.
+    :return: A (major, minor, patch) tuple with missing parts set to 0.
+    """
+    parts = re.findall(r"\d+", version)[:3]
+    if not parts:
+        raise ValueError(f"Invalid version: {version}")
+    numbers = [int(part) for part in parts] + [0] * (3 - len(parts))
+    return tuple(numbers)
+
+
+def format_version(version: Version) -> str:
+    return ".".join(str(part) for part in version)
+
+
+def _bump(version: str) -> Version:
+    """Upper bound for a caret/tilde/partial version, following npm semver as solc does."""
+    major, minor, _ = parse_version(version)
+    if len(re.findall(r"\d+", version)) == 1:
+        return (major + 1, 0, 0)
+    return (major, minor + 1, 0)
+
+
+def _caret_upper(version: str) -> Version:
+    major, minor, patch = parse_version(version)
+    explicit = len(re.findall(r"\d+", version))
+    if major > 0 or explicit == 1:
+        return (major + 1, 0, 0)
+    if minor > 0 or explicit == 2:
+        return (0, minor + 1, 0)
+    return (0, 0, patch + 1)
+
+
+def parse_pragma_range(spec: str) -> List[List[Tuple[str, Version]]]:
+    """
+    Parses a pragma version range such as "^0.8.0", ">=0.7 <0.9", "0.7.0 - 0.8.0"
+    or "0.8.19" into a disjunction of conjunctive comparator sets.
+
+    :param spec: The text between "pragma solidity" and ";".
+    :return: A list of alternatives, each a list of (operator, version) pairs.
+    """
+    alternatives = []
+    for alternative in spec.split("||"):
+        comparators = []
+        # "A - B" is ">=A <=B", where a partial B includes everything it names
+        for lower, upper in _HYPHEN_RANGE.findall(alternative):
+            comparators.append((">=", parse_version(lower)))
+            if len(re.findall(r"\d+", upper)) < 3:
+                comparators.append(("<", _bump(upper)))
+            else:
+                comparators.append(("<=", parse_version(upper)))
+        alternative = _HYPHEN_RANGE.sub(" ", alternative)
+        for token in re.findall(rf"(\^|~|>=|<=|>|<|=)?\s*({_VERSION_PATTERN})", alternative):
+            operator, version = token
+            if operator == "^":
+                comparators.append((">=", parse_version(version)))
+                comparators.append(("<", _caret_upper(version)))
+            elif operator == "~" or (
+                operator in ("", "=") and len(re.findall(r"\d+", version)) < 3
+            ):
+                comparators.append((">=", parse_version(version)))
+                comparators.append(("<", _bump(version)))
+            else:
+                comparators.append((operator or "=", parse_version(version)))
+        if comparators:
+            alternatives.append(comparators)
+    if not alternatives:
+        raise ValueError(f"Invalid pragma version range: {spec}")
+    return alternatives
+
+
+def version_satisfies(version: Version, spec: str) -> bool:
+    checks = {
+        "=": lambda a, b: a == b,
+        ">": lambda a, b: a > b,
+        ">=": lambda a, b: a >= b,
+        "<": lambda a, b: a < b,
+        "<=": lambda a, b: a <= b,
+    }
+    return any(
+        all(checks[operator](version, bound) for operator, bound in alternative)
+        for alternative in parse_pragma_range(spec)
+    )
+
+
+def _binary_version(path: str) -> Optional[Version]:
+    try:
+        output = subprocess.run(
+            [path, "--version"], capture_output=True, text=True, timeout=10
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(r"Version:\s*(\d+\.\d+\.\d+)", output)
+    return parse_version(match.group(1)) if match else None
+
+
+@functools.lru_cache(maxsize=None)
+def installed_solc_binaries() -> Dict[Version, str]:
+    """
+    Discovers locally installed solc binaries from solc-select, py-solc-x and PATH.
+    The scan runs once per process; call clear_solc_cache() after installing.
+
+    :return: A mapping of version triple to absolute binary path.
+    """
+    binaries: Dict[Version, str] = {}
+    home = os.path.expanduser("~")
+    solc_select_roots = [os.path.join(home, ".solc-select", "artifacts")]
+    if os.environ.get("VIRTUAL_ENV"):
+        solc_select_roots.append(
+            os.path.join(os.environ["VIRTUAL_ENV"], ".solc-select", "artifacts")
+        )
+    solcx_root = os.environ.get("SOLCX_BINARY_PATH", os.path.join(home, ".solcx"))
+
+    candidates = []
+    for root in solc_select_roots:
+        candidates += glob.glob(os.path.join(root, "solc-*", "solc-*"))
+        candidates += glob.glob(os.path.join(root, "solc-*"))
+    candidates += glob.glob(os.path.join(solcx_root, "solc-v*"))
+    if os.environ.get("SC_SOLC_BINARIES_DIR"):
+        candidates += glob.glob(os.path.join(os.environ["SC_SOLC_BINARIES_DIR"], "solc*"))
+
+    for path in candidates:
+        match = re.search(r"solc-v?(\d+\.\d+\.\d+)$", path)
+        if match and os.path.isfile(path) and os.access(path, os.X_OK):
+            binaries.setdefault(parse_version(match.group(1)), path)
+
+    # A system solc (e.g. from brew) is only probed once, off the hot path
+    system_solc = shutil.which("solc")
+    if system_solc and "solc-select" not in os.path.realpath(system_solc):
+        version = _binary_version(system_solc)
+        if version:
+            binaries.setdefault(version, system_solc)
+
+    return binaries
+
+
+def _install_solc(version: Version) -> bool:
+    with _install_lock:
+        retry_after = float(os.environ.get("SC_SOLC_INSTALL_RETRY", "600"))
+        if time.monotonic() - _failed_installs.get(version, -retry_after) < retry_after:
+            return False
+        try:
+            subprocess.run(
+                ["solc-select", "install", format_version(version)],
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except (OSError, subprocess.CalledProcessError):
+            _failed_installs[version] = time.monotonic()
+            return False
+        _failed_installs.pop(version, None)
+        installed_solc_binaries.cache_clear()
+        return True
+
+
+def _matching_binaries(spec: str) -> List[Tuple[Version, str]]:
+    return sorted(
+        (version, path)
+        for version, path in installed_solc_binaries().items()
+        if version_satisfies(version, spec)
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def resolve_solc(spec: str) -> Tuple[str, str]:
+    """
+    Resolves a pragma version range to the newest locally installed solc binary
+    that satisfies it. If none is installed, the lowest version the range names
+    is installed once through solc-select. Results are memoized per range, so
+    the hot path never spawns a process or touches global compiler state.
+
+    :param spec: The pragma version range, e.g. "^0.8.0" or ">=0.7 <0.9".
+    :return: A (version, binary path) tuple.
+    """
+    spec = spec.strip()
+    matches = _matching_binaries(spec)
+    if not matches:
+        lower_bounds = sorted(
+            bound
+            for alternative in parse_pragma_range(spec)
+            for operator, bound in alternative
+            if operator in (">=", "=")
+        )
+        if lower_bounds and _install_solc(lower_bounds[0]):
+            matches = _matching_binaries(spec)
+    if not matches:
+        raise SolcNotFoundError(
+            f"No installed solc satisfies '{spec}'. Install one with: solc-select install <version>"
+        )
+
+    version, path = matches[-1]
+    return format_version(version), path
+
+
+def resolve_solc_binary(spec: str) -> str:
+    return resolve_solc(spec)[1]
+
+
+def clear_solc_cache() -> None:
+    installed_solc_binaries.cache_clear()
+    resolve_solc.cache_clear()
+    with _install_lock:
+        _failed_installs.clear()
@@ -0,0 +1,68 @@
+import re
+
+SOLIDITY_MARKERS = re.compile(
+    r"pragma\s+solidity|SPDX-License-Identifier|\b(contract|interface|library)\s+\w+"
+)
+
+
+class SolidityStreamMonitor:
+    """
+    Watches an LLM completion as it streams in and decides when to stop reading.
+
+    Generation is aborted when no Solidity shows up within the first max_preamble_tokens
+    chunks (prose-only answers, endless preambles). It completes as soon as a closing code
+    fence arrives, so trailing explanations are never waited for. Unfenced code completes
+    when the stream ends.
+    """
+
+    CONTINUE = "continue"
+    COMPLETE = "complete"
+    ABORT = "abort"
+
+    def __init__(self, max_preamble_tokens: int = 200):
+        self.max_preamble_tokens = max_preamble_tokens
+        self.text = ""
+        self.tokens = 0
+        self.reason = None
+        self._code_start = None
+        self._fence_start = None
+
+    def feed(self, chunk: str) -> str:
+        """
+        Consumes the next streamed chunk.
+
+        :param chunk: The chunk's text.
+        :return: CONTINUE, COMPLETE or ABORT.
+        """
+        self.text += chunk
+        self.tokens += 1
+
+        if self._fence_start is None:
+            fence = re.search(r"```[a-zA-Z]*[ \t]*\n", self.text)
+            if fence:
+                self._fence_start = fence.end()
+
+        if self._code_start is None:
+            marker = SOLIDITY_MARKERS.search(self.text)
+            if marker:
+                self._code_start = marker.start()
+            elif self.tokens >= self.max_preamble_tokens:
+                self.reason = (
+                    f"No Solidity code found in the first {self.tokens} tokens of the response."
+                )
+                return self.ABORT
+
+        if self._fence_start is not None and "```" in self.text[self._fence_start :]:
+            return self.COMPLETE
+        return self.CONTINUE
+
+    @property
+    def code(self) -> str:
+        """The code received so far, without fences or surrounding prose."""
+        if self._fence_start is not None:
+            return self.text[self._fence_start :].split("```", 1)[0]
+        if self._code_start is not None:
+            # Keep any leading comment lines (e.g. the SPDX identifier) with the code
+            line_start = self.text.rfind("\n", 0, self._code_start) + 1
+            return self.text[line_start:]
+        return self.text
@@ -0,0 +1,284 @@
+import abc
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from langchain.schema import AIMessage, BaseMessage
+
+load_dotenv()
+
+from agents import SmartContractGenerator, get_deploy_backend, process_query, run_pipeline
+
+TESTING_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../testing"))
+DEFAULT_CORPORA = [
+    os.path.join(TESTING_DIR, "smart_contracts_output.json"),
+    os.path.join(TESTING_DIR, "sc_gen_framework.json"),
+]
+PROMPT_FILE = "../prompts/sc-generation-2.txt"
+
+FAKE_CONTRACT = """// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+contract {name} {{
+    address public owner;
+    uint256 public value;
+
+    constructor() {{
+        owner = msg.sender;
+    }}
+
+    function setValue(uint256 newValue) public {{
+        require(msg.sender == owner, "Only owner");
+        value = newValue;
+    }}
+}}
+"""
+
+
+def load_corpus(paths: List[str]) -> Dict[str, List[str]]:
+    """
+    Loads recorded generations keyed by prompt.
+
+    :param paths: Corpus JSON files, keyed by prompt with a "generated_code" per entry.
+    :return: Every recorded code per prompt, in file order.
+    """
+    corpus: Dict[str, List[str]] = defaultdict(list)
+    for path in paths:
+        with open(path, "r") as file:
+            for prompt, entry in json.load(file).items():
+                if isinstance(entry, dict) and entry.get("generated_code"):
+                    corpus[prompt].append(entry["generated_code"])
+    return dict(corpus)
+
+
+class _StandInChatModel(abc.ABC):
+    """Answers chat requests locally after a simulated LLM latency."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    @abc.abstractmethod
+    def respond(self, messages: List[BaseMessage]) -> str:
+        pass
+
+    def invoke(self, messages: List[BaseMessage]) -> AIMessage:
+        if self.latency:
+            time.sleep(self.latency)
+        return AIMessage(content=self.respond(messages))
+
+    async def ainvoke(self, messages: List[BaseMessage]) -> AIMessage:
+        return self.invoke(messages)
+
+    def stream(self, messages: List[BaseMessage]):
+        yield self.invoke(messages)
+
+    def __call__(self, messages: List[BaseMessage]) -> AIMessage:
+        return self.invoke(messages)
+
+
+class ReplayChatModel(_StandInChatModel):
+    """
+    Replays recorded generations. Requests are matched to a prompt through their
+    processed prompt (the first message); each retry gets the next recorded version.
+    """
+
+    def __init__(self, corpus: Dict[str, List[str]], prompt_file: str, latency: float = 0.0):
+        super().__init__(latency)
+        self.responses = {
+            process_query(prompt, prompt_file=prompt_file): codes
+            for prompt, codes in corpus.items()
+        }
+        self._calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def respond(self, messages: List[BaseMessage]) -> str:
+        key = messages[0].content
+        codes = self.responses.get(key)
+        if not codes:
+            return "No recorded generation for this prompt."
+        with self._lock:
+            index = self._calls[key]
+            self._calls[key] += 1
+        return codes[index % len(codes)]
+
+
+class FakeChatModel(_StandInChatModel):
+    """Returns a small valid contract, deterministic per prompt."""
+
+    def respond(self, messages: List[BaseMessage]) -> str:
+        digest = hashlib.sha256(messages[0].content.encode("utf-8")).hexdigest()
+        return "```solidity\n" + FAKE_CONTRACT.format(name=f"Fake{digest[:8]}") + "```"
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99 plus the mean and count of a sample."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": ordered[-1],
+    }
+
+
+def run_benchmark(
+    generator: SmartContractGenerator,
+    prompts: List[str],
+    concurrency: int = 4,
+    num_candidates: int = 1,
+    max_retries: int = 5,
+    prompt_file: str = PROMPT_FILE,
+    **pipeline_options,
+) -> Dict:
+    """
+    Runs the pipeline for every prompt and aggregates its stage timings.
+
+    :param generator: The generator, usually wrapping a replay or fake LLM.
+    :param prompts: The prompts to run.
+    :param concurrency: The number of pipelines running at once.
+    :param num_candidates: Candidates per attempt.
+    :param max_retries: The maximum attempts per prompt.
+    :param prompt_file: The prompt template passed to process_query.
+    :param pipeline_options: Further run_pipeline options, e.g. smoke_test.
+    :return: The JSON-serializable report.
+    """
+    stage_events = {"llm": "llm_finish", "compile": "compile_result", "deploy": "deploy_result"}
+    stages: Dict[str, List[float]] = defaultdict(list)
+    totals: List[float] = []
+    attempts: Counter = Counter()
+    outcomes: Counter = Counter()
+    lock = threading.Lock()
+
+    def on_event(event: Dict) -> None:
+        for stage, name in stage_events.items():
+            if event["event"] == name and "elapsed" in event:
+                with lock:
+                    stages[stage].append(event["elapsed"])
+
+    def run(prompt: str) -> None:
+        start = time.perf_counter()
+        try:
+            results = run_pipeline(
+                generator,
+                prompt,
+                max_retries=max_retries,
+                num_candidates=num_candidates,
+                use_feedback=True,
+                prompt_file=prompt_file,
+                on_event=on_event,
+                **pipeline_options,
+            )
+            outcome = "valid" if results["valid_code"] else "invalid"
+            attempt_count = results["attempts"]
+        except Exception as e:
+            outcome, attempt_count = type(e).__name__, None
+        with lock:
+            totals.append(time.perf_counter() - start)
+            outcomes[outcome] += 1
+            attempts[str(attempt_count)] += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run, prompts))
+    wall_time = time.perf_counter() - wall_start
+
+    return {
+        "prompts": len(prompts),
+        "concurrency": concurrency,
+        "num_candidates": num_candidates,
+        "wall_time": wall_time,
+        "throughput_per_minute": len(prompts) / wall_time * 60 if wall_time else None,
+        "outcomes": dict(outcomes),
+        "attempts": dict(sorted(attempts.items())),
+        "latency": {
+            "total": percentiles(totals),
+            **{stage: percentiles(stages[stage]) for stage in stage_events},
+        },
+    }
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the generation pipeline offline with a stand-in LLM."
+    )
+    parser.add_argument(
+        "--llm",
+        choices=["replay", "fake"],
+        default="replay",
+        help="Replay recorded generations, or answer with a fixed valid contract",
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        help="Recorded corpus JSON; may be repeated (default: the testing/ corpora)",
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per LLM call")
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("-n", "--num_versions", type=int, default=1)
+    parser.add_argument("-m", "--max_retries", type=int, default=5)
+    parser.add_argument("--limit", type=int, help="Only run the first N prompts")
+    parser.add_argument("--repeat", type=int, default=1, help="Run every prompt N times")
+    parser.add_argument("--smoke_test", action="store_true")
+    parser.add_argument("--no-autofix", action="store_true")
+    parser.add_argument("-o", "--output", help="Write the JSON report to this file")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_arguments()
+    # Deploy to in-process EVMs so the run needs no Ganache node
+    os.environ.setdefault("SC_DEPLOY_BACKEND", "eth-tester")
+    # A missing backend dependency stops the run here, not as a failure per prompt
+    get_deploy_backend()
+    corpus = load_corpus(args.corpus or DEFAULT_CORPORA)
+    prompts = list(corpus)[: args.limit] * args.repeat
+
+    if args.llm == "replay":
+        llm = ReplayChatModel(corpus, PROMPT_FILE, latency=args.llm_latency)
+    else:
+        llm = FakeChatModel(latency=args.llm_latency)
+    generator = SmartContractGenerator(
+        model_name=f"benchmark-{args.llm}",
+        llm=llm,
+        # Stand-ins are neither rate limited nor cached, so every stage is measured
+        max_concurrency=args.concurrency * args.num_versions,
+        requests_per_minute=1e9,
+        cache_mode="bypass",
+        streaming=False,
+    )
+
+    report = run_benchmark(
+        generator,
+        prompts,
+        concurrency=args.concurrency,
+        num_candidates=args.num_versions,
+        max_retries=args.max_retries,
+        smoke_test=args.smoke_test,
+        autofix=not args.no_autofix,
+    )
+    report["llm"] = args.llm
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
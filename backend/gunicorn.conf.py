@@ -0,0 +1,43 @@
+# Picked up by `gunicorn wsgi:app` from this directory (see Procfile)
+import os
+
+from dotenv import load_dotenv
+
+# Loaded in the arbiter, so the settings below and every worker see .env
+load_dotenv()
+
+# Requests block for a whole pipeline run and /process/stream holds its connection
+# open for as long, so each worker serves them from a thread pool. A sync worker
+# would handle one request at a time and be killed after the default 30s timeout.
+worker_class = "gthread"
+threads = int(os.environ.get("SC_GUNICORN_THREADS", "8"))
+# Up to five attempts of LLM generation (120s request timeout), compiling and deploying
+timeout = int(os.environ.get("SC_GUNICORN_TIMEOUT", "900"))
+graceful_timeout = timeout
+
+
+def when_ready(server):
+    # One set of Ganache nodes for all workers, owned by the arbiter; workers forked
+    # afterwards inherit the handle, and restarting a worker leaves the nodes running
+    from server_main import start_ganache
+
+    start_ganache()
+
+
+def on_exit(server):
+    from server_main import stop_ganache
+
+    stop_ganache()
+
+
+def post_fork(server, worker):
+    # The compile pool and the job consumers belong to each worker
+    from server_main import start_services
+
+    start_services()
+
+
+def worker_exit(server, worker):
+    from server_main import stop_services
+
+    stop_services()
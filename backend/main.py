@@ -1,13 +1,15 @@
 import argparse
+import logging
 import os
 from dotenv import load_dotenv
 from typing import List, Dict, Union
+
+# agents reads some SC_* settings at import
+load_dotenv()
+
 from agents import (
-    process_query,
     SmartContractGenerator,
-    # select_optimal_code,
-    check_code,
-    deploy_contract,
+    run_pipeline,
     # test_deployed_contract,
 )
 
@@ -22,7 +24,32 @@ def parse_arguments():
     # Add more arguments as needed
     # parser.add_argument("-o", "--output", type=str, help="The output file path")
     # parser.add_argument("-t", "--temperature", type=float, help="The temperature for code generation")
-    # parser.add_argument("-n", "--num_versions", type=int, help="The number of code versions to generate")
+    parser.add_argument(
+        "-n",
+        "--num_versions",
+        type=int,
+        default=3,
+        help="The number of code versions to generate per attempt",
+    )
+    parser.add_argument(
+        "-d",
+        "--deploy",
+        action="store_true",
+        help="Deploy the valid code once found; attempts are only dry-run deployed",
+    )
+    parser.add_argument(
+        "-s",
+        "--smoke_test",
+        action="store_true",
+        help="Deploy each attempt and call its view/pure functions",
+    )
+    parser.add_argument(
+        "-r",
+        "--repair_mode",
+        choices=["full", "patch"],
+        default=None,
+        help="Regenerate the whole contract on retries, or ask for edits to it (default: SC_REPAIR_MODE or full)",
+    )
     # parser.add_argument("-m", "--max_retries", type=int, help="The maximum number of retries for code generation")
     return parser.parse_args()
 
@@ -32,69 +59,36 @@ def main() -> None:
 
     warnings.filterwarnings("ignore")
 
-    load_dotenv()
     """
     Main function that orchestrates the query processing,
     code generation, merging, checking, and deployment.
     Accepts a prompt via a command-line argument via -p or --prompt flag.
     """
+    logging.basicConfig(level=os.environ.get("SC_LOG_LEVEL", "INFO").upper())
+    args = parse_arguments()
     generator = SmartContractGenerator(
-        azure_config=None, model_name="gpt-3.5-turbo", temperature=0.6
+        azure_config=None,
+        model_name="gpt-3.5-turbo",
+        temperature=0.6,
+        repair_mode=args.repair_mode,
     )
-    args = parse_arguments()
-    prompt = args.prompt
-    valid_output = False
-    generated_code, check_results, deploy_results = None, None, None
-    max_retries = 5
-    attempt_count = 0
-    feedback = {}
-
-    while not valid_output and attempt_count < max_retries:
-        attempt_count += 1
-
-        processed_query = process_query(
-            prompt, prompt_file="../prompts/sc-generation-2.txt"
-        )
-        # This function generates multiple versions of code
-        # generated_codes = generate_code_versions(processed_query)
-        # For now, let's confine this to only one
-        if generated_code:
-            generated_code = generator.generate_code_version_with_feedback(
-                processed_query, generated_code, feedback=feedback
-            )
-        else:
-            generated_code = generator.generate_initial_code_version(processed_query)
-
-        # Accordingly, we won't need this for now
-        # optimal_code = select_optimal_code(generated_codes)
-        # Check that the generated code can compile
-        check_results = check_code(generated_code)
-        # Add check results to feedback
-
-        feedback["check_results"] = check_results
-
-        if check_results["status"] == "Success":
-            deploy_results = deploy_contract(generated_code)
-            # Add deployment results to feedback
-            print(deploy_results)
-            feedback["deploy_results"] = deploy_results
-
-            if deploy_results["status"] == "Success":
-                valid_output = True
-
-                # test_results = test_deployed_contract(
-                #    deploy_results["contract_address"]
-                # )
-                # Add test results to feedback
-                # feedback["test_results"] = test_results
-                # if test_results["status"] == "Success":
-                #   valid_output = True
-
-        # if not valid_output:
-        # print(check_results)
-        # print(deploy_results)
-        # print("Operation failed, attempting again...\n")
-    return valid_output
+    results = run_pipeline(
+        generator,
+        args.prompt,
+        max_retries=5,
+        num_candidates=args.num_versions,
+        use_feedback=True,
+        final_deploy=args.deploy,
+        smoke_test=args.smoke_test,
+    )
+    print(results["deploy_results"])
+
+    # test_results = test_deployed_contract(
+    #    results["deploy_results"]["contract_address"]
+    # )
+    # Add test results to feedback
+    # feedback["test_results"] = test_results
+    return results["valid_code"]
 
 
 if __name__ == "__main__":
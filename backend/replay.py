@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from agents import check_code, deploy_contract, get_deploy_backend
+from benchmark import TESTING_DIR, percentiles
+
+DEFAULT_CORPORA = [
+    os.path.join(TESTING_DIR, "smart_contracts_output.json"),
+    os.path.join(TESTING_DIR, "smart_contracts_output_fails.json"),
+    os.path.join(TESTING_DIR, "sc_gen_framework.json"),
+]
+
+
+def iter_corpus(paths: List[str]) -> Iterator[Dict]:
+    """
+    Yields the recorded contracts of the corpora one at a time.
+
+    :param paths: Corpus JSON files, keyed by prompt with "generated_code",
+        "check_results" and "deploy_results" per entry.
+    :return: Entries with the corpus, prompt, code and recorded stage statuses. Entries
+        without generated code (e.g. failed LLM requests) are skipped.
+    """
+    for path in paths:
+        with open(path, "r") as file:
+            corpus = json.load(file)
+        for prompt, entry in corpus.items():
+            if not isinstance(entry, dict) or not entry.get("generated_code"):
+                continue
+            yield {
+                "corpus": os.path.basename(path),
+                "prompt": prompt,
+                "code": entry["generated_code"],
+                "recorded": {
+                    "compile": (entry.get("check_results") or {}).get("status"),
+                    "deploy": (entry.get("deploy_results") or {}).get("status"),
+                },
+            }
+
+
+def replay_entry(entry: Dict, deploy: str = "dry_run") -> Dict:
+    """
+    Checks and deploys one recorded contract. Runs in a worker process.
+
+    :param entry: An entry from iter_corpus().
+    :param deploy: "dry_run" to only simulate the creation transaction, "real" to mine
+        it, or "none" to stop after compiling.
+    :return: The entry's replayed stage statuses, first errors and timings.
+    """
+    start = time.perf_counter()
+    check_results = check_code(entry["code"])
+    compile_time = time.perf_counter() - start
+    replayed = {"compile": check_results["status"], "deploy": None}
+    errors = {"compile": check_results["errors"][:1]}
+    timings = {"compile": compile_time}
+
+    if deploy != "none" and check_results["status"] == "Success":
+        stage_start = time.perf_counter()
+        deploy_results = deploy_contract(
+            entry["code"],
+            artifacts=check_results.get("artifacts"),
+            dry_run=deploy == "dry_run",
+        )
+        timings["deploy"] = time.perf_counter() - stage_start
+        replayed["deploy"] = deploy_results["status"]
+        errors["deploy"] = deploy_results["errors"][:1]
+
+    return {
+        "corpus": entry["corpus"],
+        "prompt": entry["prompt"],
+        "recorded": entry["recorded"],
+        "replayed": replayed,
+        "errors": errors,
+        "timings": timings,
+    }
+
+
+def _replay(args) -> Dict:
+    return replay_entry(*args)
+
+
+def _init_worker() -> None:
+    # Each worker deploys to its own in-process EVM, so replays need no Ganache node
+    # and real deploys from several processes don't race on shared nonces and snapshots
+    os.environ.setdefault("SC_DEPLOY_BACKEND", "eth-tester")
+    # The workers already are the parallelism: one compiler process each, rather than
+    # a full compile pool per worker oversubscribing the CPUs
+    os.environ["SC_COMPILE_WORKERS"] = "1"
+
+
+def diff_outcome(result: Dict, stages: List[str]) -> List[Dict]:
+    """
+    Compares a replayed entry with its recording.
+
+    :return: One mismatch per stage whose status changed, labelled "regressed" if it
+        used to succeed and "fixed" if it succeeds now.
+    """
+    mismatches = []
+    for stage in stages:
+        recorded, replayed = result["recorded"][stage], result["replayed"][stage]
+        if recorded == replayed:
+            continue
+        if recorded == "Success":
+            change = "regressed"
+        elif replayed == "Success":
+            change = "fixed"
+        else:
+            change = "changed"
+        mismatches.append(
+            {
+                "corpus": result["corpus"],
+                "prompt": result["prompt"],
+                "stage": stage,
+                "change": change,
+                "recorded": recorded,
+                "replayed": replayed,
+                "errors": result["errors"].get(stage, []),
+            }
+        )
+    return mismatches
+
+
+def run_replay(
+    paths: List[str],
+    workers: int = None,
+    deploy: str = "dry_run",
+    limit: int = None,
+    repeat: int = 1,
+) -> Dict:
+    """
+    Streams recorded contracts through check_code and deploy_contract in a process
+    pool and diffs the outcomes against the recorded ones.
+
+    :param paths: The corpus JSON files.
+    :param workers: The number of worker processes (default: one per CPU).
+    :param deploy: "dry_run", "real" or "none", see replay_entry.
+    :param limit: Only replay the first N contracts.
+    :param repeat: Replay every contract N times, e.g. to measure warm caches.
+    :return: The JSON-serializable report.
+    """
+    if deploy != "none":
+        # Check the workers' deploy backend up front instead of failing in every worker
+        os.environ.setdefault("SC_DEPLOY_BACKEND", "eth-tester")
+        get_deploy_backend()
+    entries = list(iter_corpus(paths))[:limit] * repeat
+    stages = ["compile"] if deploy == "none" else ["compile", "deploy"]
+    outcomes = {stage: Counter() for stage in stages}
+    timings: Dict[str, List[float]] = {stage: [] for stage in stages}
+    mismatches: List[Dict] = []
+    diffed = set()
+
+    wall_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        for result in executor.map(
+            _replay, ((entry, deploy) for entry in entries), chunksize=4
+        ):
+            for stage in stages:
+                outcomes[stage][str(result["replayed"][stage])] += 1
+                if stage in result["timings"]:
+                    timings[stage].append(result["timings"][stage])
+            # Only report each contract once when repeating
+            key = (result["corpus"], result["prompt"])
+            if key not in diffed:
+                diffed.add(key)
+                mismatches.extend(diff_outcome(result, stages))
+    wall_time = time.perf_counter() - wall_start
+
+    changes = Counter(m["change"] for m in mismatches)
+    return {
+        "contracts": len(entries),
+        "workers": workers or os.cpu_count(),
+        "deploy": deploy,
+        "wall_time": wall_time,
+        "contracts_per_second": len(entries) / wall_time if wall_time else None,
+        "outcomes": {stage: dict(counts) for stage, counts in outcomes.items()},
+        "latency": {stage: percentiles(values) for stage, values in timings.items()},
+        "changes": dict(changes),
+        "mismatches": mismatches,
+    }
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Replay recorded generations through the compile and deploy stages."
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        help="Recorded corpus JSON; may be repeated (default: the testing/ corpora)",
+    )
+    parser.add_argument("-w", "--workers", type=int, help="Worker processes")
+    parser.add_argument(
+        "--deploy",
+        choices=["dry_run", "real", "none"],
+        default="dry_run",
+        help="Simulate the deploy, mine it, or stop after compiling",
+    )
+    parser.add_argument("--limit", type=int, help="Only replay the first N contracts")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay every contract N times")
+    parser.add_argument("-o", "--output", help="Write the JSON report to this file")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_arguments()
+    report = run_replay(
+        args.corpus or DEFAULT_CORPORA,
+        workers=args.workers,
+        deploy=args.deploy,
+        limit=args.limit,
+        repeat=args.repeat,
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,34 @@
-from flask import Flask, request, jsonify
-import subprocess
+from flask import Flask, Response, request, jsonify, stream_with_context
 import os
+import json
+import logging
+import queue
+import threading
 import time
 from dotenv import load_dotenv
+
+# Before importing agents: some of its settings are read when its modules load
+load_dotenv()
+
 from agents import (
-    process_query,
     SmartContractGenerator,
-    check_code,
-    deploy_contract,
+    CompilerBusyError,
+    run_pipeline,
     test_deployed_contract,
+    JobQueue,
+    JobQueueFullError,
+    PipelineCancelled,
+    GanachePool,
+    get_compile_service,
+    get_deploy_backend,
+    render_metrics,
 )
 
 app = Flask(__name__)
-# Start Ganache CLI as a subprocess
-ganache_process = subprocess.Popen(
-    ["ganache-cli", "-p", "8545"], stdout=subprocess.PIPE
-)
-load_dotenv()
+# Generated code and full error dumps are logged at DEBUG
+logging.basicConfig(level=os.environ.get("SC_LOG_LEVEL", "INFO").upper())
+
+ganache_process = None
 
 generator = SmartContractGenerator(
     azure_config=None, model_name="gpt-3.5-turbo", temperature=0.6
@@ -25,15 +37,104 @@ generator = SmartContractGenerator(
 
 @app.route("/")
 def index():
-    return "Ganache CLI running in background on port 7545"
+    if ganache_process is None:
+        return "Deploying to an in-process EVM"
+    ports = ", ".join(str(port) for port in ganache_process.ports)
+    return f"Ganache CLI running in background on port(s) {ports}"
+
+
+@app.route("/metrics")
+def metrics():
+    # Per process: with several gunicorn workers, each one exposes its own metrics
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/shutdown", methods=["POST"])
 def shutdown():
-    ganache_process.terminate()
+    if ganache_process is not None:
+        ganache_process.terminate()
     return "Ganache CLI terminated"
 
 
+def run_prompt(
+    prompt: str, num_candidates: int = None, on_event=None, cancel_event=None
+):
+    """
+    Runs the generation pipeline for a prompt.
+
+    :param prompt: The user's prompt.
+    :param num_candidates: Candidates per attempt, defaulting to SC_NUM_CANDIDATES.
+    :param on_event: Receives the pipeline's progress events.
+    :param cancel_event: Stops the pipeline before its next stage when set.
+    :return: A (response body, HTTP status code) tuple.
+    :raises CompilerBusyError: If the compile service is at capacity; the caller
+        decides whether to reject the request or retry it later.
+    """
+    num_candidates = int(num_candidates or os.environ.get("SC_NUM_CANDIDATES", 3))
+
+    time_start = time.time()
+    try:
+        results = run_pipeline(
+            generator,
+            prompt,
+            max_retries=5,
+            num_candidates=num_candidates,
+            use_feedback=False,
+            on_event=on_event,
+            cancel_event=cancel_event,
+            # Attempts are validated with dry runs; deploy the winner for its address
+            final_deploy=os.environ.get("SC_FINAL_DEPLOY", "1") == "1",
+            smoke_test=os.environ.get("SC_SMOKE_TESTS", "1") == "1",
+            static_analysis=os.environ.get("SC_STATIC_ANALYSIS") == "1",
+            autofix=os.environ.get("SC_AUTOFIX", "1") == "1",
+        )
+    except PipelineCancelled as e:
+        return {"error": str(e)}, 499
+
+    if not results["valid_code"]:
+        return {"error": "Failed to deploy code successfully"}, 500
+
+    security_results = None
+    contract_address = results["deploy_results"].get("contract_address")
+    if os.environ.get("SC_SECURITY_TESTS") == "1" and contract_address:
+        security_results = test_deployed_contract(
+            contract_address,
+            results["generated_code"],
+            artifacts=results["check_results"].get("artifacts"),
+        )
+    return (
+        {
+            "valid_code": results["valid_code"],
+            "generated_code": results["generated_code"],
+            "check_results": results["check_results"],
+            "deploy_results": results["deploy_results"],
+            "test_results": results["test_results"],
+            "analysis_results": results["analysis_results"],
+            "security_results": security_results,
+            "attempts": results["attempts"],
+            "total_time": time.time() - time_start,
+        },
+        200,
+    )
+
+
+def run_job(payload):
+    # CompilerBusyError propagates, so the queue retries the job after a backoff
+    body, status_code = run_prompt(payload["prompt"], payload.get("num_candidates"))
+    return {"status_code": status_code, **body}
+
+
+job_queue = JobQueue(
+    run_job,
+    path=os.environ.get("SC_JOB_DB"),
+    num_workers=int(os.environ.get("SC_JOB_WORKERS", "2")),
+    max_queued=int(os.environ.get("SC_JOB_QUEUE_LIMIT", "100")),
+    retry_on=(CompilerBusyError,),
+    retry_delay=float(os.environ.get("SC_JOB_RETRY_DELAY", "5")),
+    max_retries=int(os.environ.get("SC_JOB_MAX_RETRIES", "5")),
+)
+
+
 @app.route("/process", methods=["POST"])
 def process_code():
     data = request.json
@@ -41,56 +142,136 @@ def process_code():
     if not prompt:
         return jsonify({"error": "Prompt is required"}), 400
 
-    valid_output = False
-    generated_code, check_results, deploy_results = None, None, None
-    max_retries = 5
-    attempt_count = 0
-    total_time = 0
-    feedback = {}
+    try:
+        body, status_code = run_prompt(prompt, data.get("num_candidates"))
+    except CompilerBusyError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify(body), status_code
+
 
+@app.route("/process/stream", methods=["GET", "POST"])
+def process_code_stream():
+    """
+    Runs the pipeline like /process but streams progress as Server-Sent Events.
+    The last event is "result", carrying the /process response body and status code.
+    Closing the connection cancels the pipeline before its next stage.
+    """
+    data = request.get_json(silent=True) or request.args
+    prompt = data.get("prompt")
+    if not prompt:
+        return jsonify({"error": "Prompt is required"}), 400
+    num_candidates = data.get("num_candidates")
+
+    events = queue.Queue()
+    cancel_event = threading.Event()
     time_start = time.time()
-    while not valid_output and attempt_count < max_retries:
-        attempt_count += 1
-        processed_query = process_query(
-            prompt, prompt_file="../prompts/sc-generation-2.txt"
-        )
-        generated_code = generator.generate_initial_code_version(processed_query)
 
-        check_results = check_code(generated_code)
-        feedback["check_results"] = check_results
+    def on_event(event):
+        events.put(dict(event, total_elapsed=time.time() - time_start))
 
-        if check_results["status"] == "Success":
-            deploy_results = deploy_contract(generated_code)
-            feedback["deploy_results"] = deploy_results
+    def run():
+        try:
+            body, status_code = run_prompt(
+                prompt, num_candidates, on_event=on_event, cancel_event=cancel_event
+            )
+        except CompilerBusyError as e:
+            body, status_code = {"error": str(e)}, 503
+        except Exception as e:
+            # The stream only ends on a "result" event, so failures must send one too
+            body, status_code = {"error": str(e)}, 500
+        events.put({"event": "result", "status_code": status_code, **body})
 
-            if deploy_results["status"] == "Success":
-                valid_output = True
-            #     test_results = test_deployed_contract(
-            #         deploy_results["contract_address"], generated_code
-            #     )
-            #     feedback["test_results"] = test_results
+    threading.Thread(target=run, daemon=True).start()
 
-            #     if test_results["status"] == "Success":
-            #         valid_output = True
+    def stream():
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=15)
+                except queue.Empty:
+                    # Keeps proxies such as the Heroku router from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+                if event["event"] == "result":
+                    break
+        finally:
+            cancel_event.set()
 
-    if not valid_output:
-        return jsonify({"error": "Failed to deploy code successfully"}), 500
-    return jsonify(
-        {
-            "valid_code": valid_output,
-            "generated_code": generated_code,
-            "check_results": check_results,
-            "deploy_results": deploy_results,
-            # "test_results": test_results,
-            "attempts": attempt_count,
-            "total_time": time.time() - time_start,
-        }
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    data = request.json
+    prompt = data.get("prompt")
+    if not prompt:
+        return jsonify({"error": "Prompt is required"}), 400
+
+    try:
+        job_id = job_queue.submit(
+            {"prompt": prompt, "num_candidates": data.get("num_candidates")}
+        )
+    except JobQueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+def start_ganache() -> None:
+    """
+    Starts a Ganache CLI process per port in SC_GANACHE_PORTS (default 8545), unless
+    contracts are deployed to an in-process EVM. The nodes are shared by every
+    serving process, so under gunicorn this runs once in the arbiter (when_ready).
+    """
+    global ganache_process
+    if ganache_process is None and os.environ.get("SC_DEPLOY_BACKEND", "rpc") == "rpc":
+        ganache_process = GanachePool()
+        ganache_process.start()
+
+
+def stop_ganache() -> None:
+    global ganache_process
+    if ganache_process is not None:
+        ganache_process.terminate()
+        ganache_process = None
+
+
+def start_services() -> None:
+    """
+    Starts the serving process's own background services. This runs from __main__ or
+    the gunicorn post_fork hook rather than at import, so processes that merely import
+    this module (e.g. multiprocessing children) don't start them again.
+    """
+    # SC_JOB_WORKERS consumer threads per serving process
+    job_queue.start()
+    # Configuration errors (e.g. a missing backend dependency) surface at start-up
+    get_deploy_backend()
+    # Start the compiler workers now rather than on the first request
+    get_compile_service().warm_up()
+
+
+def stop_services() -> None:
+    job_queue.stop()
+
+
 if __name__ == "__main__":
+    start_ganache()
+    start_services()
     try:
         app.run(port=5000, debug=True)
     finally:
+        stop_services()
         # Ensure Ganache CLI is terminated when Flask app stops
-        ganache_process.terminate()
+        stop_ganache()
@@ -1,8 +1,10 @@
-from flask import Flask, render_template, request
+from flask import Flask, Response, render_template, request, stream_with_context
 import requests  # Import the requests library
 
 app = Flask(__name__)
 
+BACKEND_BASE_URL = "https://sc-gen-backend-6650784bc8d3.herokuapp.com"
+
 
 @app.route("/", methods=["GET", "POST"])
 def home():
@@ -12,7 +14,7 @@ def home():
             return render_template("home.html", error="Prompt is required.")
 
         # Prepare the URL to call the backend API
-        backend_url = "https://sc-gen-backend-6650784bc8d3.herokuapp.com/process"
+        backend_url = f"{BACKEND_BASE_URL}/process"
 
         # Make a POST request to the backend
         try:
@@ -28,3 +30,35 @@ def home():
             return render_template("home.html", error=str(e))
 
     return render_template("home.html")
+
+
+@app.route("/stream")
+def stream():
+    # Relay the backend's progress events so the page can render them as they arrive
+    prompt = request.args.get("prompt")
+    if not prompt:
+        return Response("Prompt is required.", status=400)
+
+    try:
+        response = requests.get(
+            f"{BACKEND_BASE_URL}/process/stream",
+            params={"prompt": prompt},
+            stream=True,
+            timeout=(10, None),
+        )
+    except requests.exceptions.RequestException as e:
+        return Response(str(e), status=502)
+
+    def relay():
+        try:
+            for chunk in response.iter_content(chunk_size=None):
+                yield chunk
+        finally:
+            # Closing the upstream connection cancels the backend pipeline
+            response.close()
+
+    return Response(
+        stream_with_context(relay()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )